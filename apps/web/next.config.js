@@ -444,3 +444,12 @@ const nextConfig = {
 };
 
 module.exports = withTM(withExpo(nextConfig));
+
+// `bisect_next_config_build.py --overlay` builds generated variants of this
+// file without editing it; hand over to the one it names.
+if (
+    process.env.NEXT_BISECT_CONFIG &&
+    path.resolve(process.env.NEXT_BISECT_CONFIG) !== __filename
+) {
+    module.exports = require(path.resolve(process.env.NEXT_BISECT_CONFIG));
+}
@@ -5,123 +5,315 @@ import sys
 import threading
 import atexit
 import os
+import select
+import signal
+import socket
+import ctypes
+import ctypes.util
 import tempfile
+import queue
+import random
+import argparse
 import wave
 import math
+import array
+import hashlib
 import struct
 import time
 import psutil  # pip install psutil
 import simpleaudio as sa  # pip install simpleaudio
 
+from process_matching import (
+    DEV_SERVER_MATCHER,
+    ProcessRegistry,
+    cleanup_orphans,
+)
+from route_latency import LatencyAnalytics, STATS_FILE, SNAPSHOT_INTERVAL
+
 LOG_FILE = "next.log"
+DEV_SERVER_CMD = "pnpm.cmd run dev"
+DEV_SERVER_PORT = 3000
+
+# Defaults for the rotating copy of the dev server output in pipe mode.
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 3
 
+# Dev servers started by this script, so orphans are found without a scan.
+DEV_SERVER_REGISTRY = ProcessRegistry()
 
-def cleanup_orphaned_dev_servers():
+
+def cleanup_orphaned_dev_servers(scan=None):
     """
-    Finds and kills orphaned dev server processes that were created by this script.
-    A process is considered a dev server if its command line (case-insensitive)
-    contains both 'pnpm.cmd' and 'run dev'.
+    Finds and kills orphaned dev server process trees created by this script.
+    Dev servers recorded in the PID registry are looked up directly. The
+    process table is scanned as well (for command lines containing both
+    'pnpm.cmd' and 'run dev') when `scan` is set, or by default when no
+    registry exists yet.
     """
     print("Cleaning up orphaned dev server processes...")
-    for proc in psutil.process_iter(attrs=["pid", "name", "cmdline"]):
-        try:
-            cmdline_list = proc.info.get("cmdline")
-            if not cmdline_list or not isinstance(cmdline_list, list):
-                continue
-            cmdline = " ".join(cmdline_list).lower()
-            if "pnpm.cmd" in cmdline and "run dev" in cmdline:
-                print(
-                    f"  Killing orphaned process: PID {proc.info['pid']} - {cmdline}"
-                )
-                proc.kill()
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
+    if scan is None:
+        scan = not DEV_SERVER_REGISTRY.exists()
+    cleanup_orphans(
+        [DEV_SERVER_MATCHER], registry=DEV_SERVER_REGISTRY, scan=scan
+    )
 
 
-def safe_remove_log_file(filename, retries=10, delay=0.5):
+def safe_truncate_log_file(filename, retries=10, delay=0.5):
     """
-    Attempt to remove the file, retrying if a PermissionError occurs.
-    Returns True if removal succeeded, False otherwise.
+    Empty the file in place, retrying if a PermissionError occurs. The log is
+    truncated rather than removed because the tailer keeps it open, which
+    makes removal fail on Windows; the tailer notices the truncation and
+    starts over from the beginning.
+    Returns True if truncation succeeded, False otherwise.
     """
     for _ in range(retries):
         try:
-            os.remove(filename)
+            with open(filename, "r+b") as f:
+                f.truncate(0)
             return True
         except PermissionError:
             time.sleep(delay)
     return False
 
 
-def create_music_wav():
+FRAMERATE = 44100
+TONE_AMPLITUDE = 10000  # quieter sound
+TONE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "next-alert-tones")
+
+# Alert tones: name -> (frequencies in Hz, duration in seconds).
+ALERT_TONES = {
+    "fast": ([523.25, 659.25, 783.99], 0.3),  # C5 major, short
+    "ok": ([261.63, 329.63, 392.00], 0.5),  # C4, E4, G4
+    "slow": ([196.00, 246.94, 293.66], 0.8),  # G3 major, long
+    "client_error": ([261.63, 311.13, 392.00], 0.5),  # C4 minor
+    "server_error": ([146.83, 207.65, 220.00], 0.9),  # dissonant, low
+}
+# Latency buckets for successful responses: (upper bound in ms, tone).
+LATENCY_TONES = [(1000, "fast"), (10000, "ok")]
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def synthesize_chord(
+    frequencies, duration, amplitude=TONE_AMPLITUDE, framerate=FRAMERATE
+):
     """
-    Generates a 0.5-second musical chord (C major: C4, E4, G4) with a gentle envelope,
-    writes it to a temporary WAV file, and returns its path.
+    Returns 16-bit little-endian mono PCM for a chord of `frequencies` with a
+    gentle sine envelope. Uses NumPy when available, otherwise array('h').
     """
-    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    tmp_file_path = tmp_file.name
-    tmp_file.close()
-
-    framerate = 44100
-    duration = 0.5
-    frequencies = [261.63, 329.63, 392.00]  # C4, E4, G4 in Hz
-    amplitude = 10000  # quieter sound
     nframes = int(duration * framerate)
+    if np is not None:
+        t = np.arange(nframes) / framerate
+        envelope = np.sin(np.pi * t / duration)
+        mix = sum(np.sin(2 * np.pi * f * t) for f in frequencies)
+        samples = amplitude * envelope * mix / len(frequencies)
+        return samples.astype("<i2").tobytes()
 
-    with wave.open(tmp_file_path, "w") as wav_file:
-        wav_file.setparams(
-            (1, 2, framerate, nframes, "NONE", "not compressed")
-        )
-        for i in range(nframes):
-            t = i / framerate
-            envelope = math.sin(math.pi * t / duration)
-            sample_value = sum(
-                math.sin(2 * math.pi * f * t) for f in frequencies
-            ) / len(frequencies)
-            sample = amplitude * envelope * sample_value
-            wav_file.writeframes(struct.pack("<h", int(sample)))
-    return tmp_file_path
-
-
-# Create the musical sound file; ensure it's removed on exit.
-SOUND_FILE = create_music_wav()
-atexit.register(
-    lambda: os.remove(SOUND_FILE) if os.path.exists(SOUND_FILE) else None
-)
+    scale = amplitude / len(frequencies)
+    omegas = [2 * math.pi * f / framerate for f in frequencies]
+    envelope_step = math.pi / (duration * framerate)
+    sin = math.sin
+    samples = array.array(
+        "h",
+        [
+            int(
+                scale
+                * sin(envelope_step * i)
+                * sum(sin(w * i) for w in omegas)
+            )
+            for i in range(nframes)
+        ],
+    )
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.tobytes()
 
 
-def play_sound():
+def load_tone(name, framerate=FRAMERATE):
     """
-    Plays the generated musical sound using simpleaudio in a non-blocking way.
+    Returns the PCM for the alert tone `name`. Generated tones are cached as WAV
+    files in TONE_CACHE_DIR, keyed by their synthesis parameters.
     """
+    frequencies, duration = ALERT_TONES[name]
+    key = repr((frequencies, duration, TONE_AMPLITUDE, framerate))
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    path = os.path.join(TONE_CACHE_DIR, f"{name}-{digest}.wav")
+    try:
+        with wave.open(path, "rb") as wav_file:
+            return wav_file.readframes(wav_file.getnframes())
+    except (OSError, EOFError, wave.Error):
+        pass
+
+    pcm = synthesize_chord(frequencies, duration, framerate=framerate)
+    try:
+        os.makedirs(TONE_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with wave.open(tmp_path, "wb") as wav_file:
+            wav_file.setparams(
+                (1, 2, framerate, len(pcm) // 2, "NONE", "not compressed")
+            )
+            wav_file.writeframes(pcm)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not cache alert tone {path}: {e}", file=sys.stderr)
+    return pcm
+
 
-    def _play():
+TONES = {name: load_tone(name) for name in ALERT_TONES}
+
+
+def tone_for_response(status, duration_ms):
+    """
+    Picks the alert tone for an HTTP response: errors by status class,
+    successful responses by latency bucket.
+    """
+    if status.startswith("5"):
+        return "server_error"
+    if status.startswith("4"):
+        return "client_error"
+    for limit, tone in LATENCY_TONES:
+        if duration_ms < limit:
+            return tone
+    return "slow"
+
+
+class AlertPlayer:
+    """
+    Single long-lived playback worker. Tones are decoded once into
+    sa.WaveObjects, play requests arrive on a queue, and at most
+    `max_voices` alerts sound at once (the oldest voice is stopped to make
+    room). The first request plays immediately; requests within `debounce`
+    seconds after it are coalesced, and only replayed (as the most severe of
+    them) when more severe than the tone that already sounded.
+    """
+
+    # Most severe first.
+    TONE_PRIORITY = ["server_error", "client_error", "slow", "ok", "fast"]
+
+    def __init__(self, tones, debounce=0.25, max_voices=2):
+        self.wave_objects = {
+            name: sa.WaveObject(pcm, 1, 2, FRAMERATE)
+            for name, pcm in tones.items()
+        }
+        self.debounce = debounce
+        self.max_voices = max(1, max_voices)
+        self.voices = []
+        self.coalesced = 0
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def play(self, tone="ok"):
+        self.queue.put(tone)
+
+    def _severity(self, tone):
         try:
-            wave_obj = sa.WaveObject.from_wave_file(SOUND_FILE)
-            wave_obj.play()
-        except Exception as e:
-            print(f"Error playing sound: {e}", file=sys.stderr)
+            return self.TONE_PRIORITY.index(tone)
+        except ValueError:
+            return len(self.TONE_PRIORITY)
+
+    def _collect(self, played):
+        """
+        Gather every request arriving within the debounce window after
+        `played`, which has already sounded. Returns the most severe of them
+        if it is more severe than `played`, otherwise None (the requests are
+        suppressed).
+        """
+        deadline = time.monotonic() + self.debounce
+        worst = None
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                other = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            self.coalesced += 1
+            if worst is None or self._severity(other) < self._severity(worst):
+                worst = other
+        if worst is not None and self._severity(worst) < self._severity(played):
+            return worst
+        return None
+
+    def _start_voice(self, tone):
+        self.voices = [v for v in self.voices if v.is_playing()]
+        while len(self.voices) >= self.max_voices:
+            self.voices.pop(0).stop()
+        self.voices.append(self.wave_objects[tone].play())
+
+    def _run(self):
+        while True:
+            tone = self.queue.get()
+            while tone is not None:
+                try:
+                    self._start_voice(tone)
+                except Exception as e:
+                    print(f"Error playing sound: {e}", file=sys.stderr)
+                tone = self._collect(tone)
+
+
+ALERT_PLAYER = None
+
+
+def start_alert_player(debounce=0.25, max_voices=2):
+    """
+    Creates the shared AlertPlayer used by play_sound.
+    """
+    global ALERT_PLAYER
+    ALERT_PLAYER = AlertPlayer(TONES, debounce, max_voices)
+    return ALERT_PLAYER
+
 
-    threading.Thread(target=_play, daemon=True).start()
+def play_sound(tone="ok"):
+    """
+    Queues an alert tone on the shared playback worker (non-blocking).
+    """
+    if ALERT_PLAYER is None:
+        start_alert_player()
+    ALERT_PLAYER.play(tone)
 
 
-def start_dev_server():
+def start_dev_server(capture="file"):
     """
-    Starts the Next.js dev server (via pnpm) with output redirected to LOG_FILE.
-    Attempts to remove LOG_FILE (waiting until it is unlocked) before starting.
+    Starts the Next.js dev server (via pnpm).
+    With capture="file", output is redirected to LOG_FILE by the shell; the file
+    is emptied first (waiting until it is unlocked). With capture="pipe", stdout
+    and stderr are merged into a pipe read by read_dev_server_output.
     Returns the subprocess.Popen object.
     """
+    if capture == "pipe":
+        try:
+            process = subprocess.Popen(
+                DEV_SERVER_CMD,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+            )
+            DEV_SERVER_REGISTRY.register(process.pid, DEV_SERVER_CMD)
+            print("Started pnpm dev server (reading its output directly)")
+            return process
+        except Exception as e:
+            print(f"Failed to start dev server: {e}", file=sys.stderr)
+            return None
+
     if os.path.exists(LOG_FILE):
-        if not safe_remove_log_file(LOG_FILE):
+        if not safe_truncate_log_file(LOG_FILE):
             print(
-                f"Warning: Could not remove {LOG_FILE}; using existing file.",
+                f"Warning: Could not truncate {LOG_FILE}; using existing file.",
                 file=sys.stderr,
             )
-    cmd = f"pnpm.cmd run dev > {LOG_FILE} 2>&1"
+    cmd = f"{DEV_SERVER_CMD} > {LOG_FILE} 2>&1"
     try:
         # Start the process in a new process group.
         process = subprocess.Popen(
             cmd, shell=True, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
         )
+        DEV_SERVER_REGISTRY.register(process.pid, cmd)
         print(f"Started pnpm dev server (logs to {LOG_FILE})")
         return process
     except Exception as e:
@@ -129,43 +321,418 @@ def start_dev_server():
         return None
 
 
+class LineBuffer:
+    """
+    Reusable byte buffer that splits incoming data into lines.
+
+    Data is read straight into a preallocated bytearray, the search for newlines
+    resumes where the previous search stopped, and each complete line is
+    decoded directly from a memoryview slice. Consumed bytes are reclaimed by
+    moving the (short) unfinished tail to the front only when the buffer is
+    full.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self.buffer = bytearray(capacity)
+        self.start = 0  # first byte not yet returned as part of a line
+        self.end = 0  # end of valid data
+        self.scanned = 0  # no newline exists in buffer[start:scanned]
+
+    def _make_room(self):
+        if self.end < len(self.buffer):
+            return
+        pending = self.end - self.start
+        if self.start:
+            self.buffer[:pending] = self.buffer[self.start : self.end]
+            self.scanned -= self.start
+            self.start = 0
+            self.end = pending
+        if self.end == len(self.buffer):
+            self.buffer.extend(bytes(len(self.buffer)))
+
+    def read_from(self, f):
+        """
+        Read whatever `f` (an unbuffered binary file) has available into the
+        buffer. Returns the number of bytes read.
+        """
+        self._make_room()
+        with memoryview(self.buffer) as view:
+            n = f.readinto(view[self.end :]) or 0
+        self.end += n
+        return n
+
+    def feed(self, data):
+        """
+        Append bytes that were obtained elsewhere (e.g. from a pipe).
+        """
+        while self.end + len(data) > len(self.buffer):
+            self._make_room()
+            if self.end + len(data) > len(self.buffer):
+                self.buffer.extend(bytes(len(self.buffer)))
+        self.buffer[self.end : self.end + len(data)] = data
+        self.end += len(data)
+
+    def lines(self):
+        """
+        Yield every complete line currently buffered, newline included.
+        """
+        while True:
+            index = self.buffer.find(b"\n", self.scanned, self.end)
+            if index < 0:
+                self.scanned = self.end
+                break
+            with memoryview(self.buffer) as view:
+                line = str(view[self.start : index + 1], "utf-8", "replace")
+            self.start = self.scanned = index + 1
+            yield line
+        if self.start == self.end:
+            self.start = self.end = self.scanned = 0
+
+    def reset(self):
+        self.start = self.end = self.scanned = 0
+
+
+class InotifyWatch:
+    """
+    Minimal inotify wrapper (Linux only, via ctypes) that waits for changes to
+    one file name inside its directory, including the file being created,
+    replaced or deleted.
+    """
+
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, path):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify is not available on this platform")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = (
+            self.IN_MODIFY
+            | self.IN_ATTRIB
+            | self.IN_MOVED_FROM
+            | self.IN_MOVED_TO
+            | self.IN_CREATE
+            | self.IN_DELETE
+        )
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+        self.name = os.path.basename(path).encode()
+
+    def wait(self, timeout):
+        """
+        Block until the watched file changes or `timeout` seconds pass.
+        Returns True if a relevant event arrived.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        relevant = False
+        try:
+            while True:
+                data = os.read(self.fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    _, _, _, length = self.EVENT_HEADER.unpack_from(
+                        data, offset
+                    )
+                    offset += self.EVENT_HEADER.size
+                    name = data[offset : offset + length].rstrip(b"\0")
+                    offset += length
+                    if name == self.name:
+                        relevant = True
+        except BlockingIOError:
+            pass
+        return relevant
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogTailer:
+    """
+    Follows a log file that another process appends to.
+
+    The file stays open between reads, new bytes go through a LineBuffer, and
+    rotation (a different inode at the same path) or truncation (the file got
+    shorter than what was already read) makes the tailer start over from the
+    beginning of the current file. It sleeps on inotify where available, and
+    otherwise polls with a backoff that grows while the file is idle.
+    """
+
+    def __init__(
+        self,
+        path,
+        min_interval=0.01,
+        max_interval=0.5,
+        inotify_timeout=1.0,
+    ):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.inotify_timeout = inotify_timeout
+        self.file = None
+        self.identity = None
+        self.position = 0
+        self.buffer = LineBuffer()
+        try:
+            self.watch = InotifyWatch(path)
+        except OSError:
+            self.watch = None
+
+    def _open(self):
+        try:
+            f = open(self.path, "rb", buffering=0)
+        except OSError:
+            return False
+        st = os.fstat(f.fileno())
+        self.file = f
+        self.identity = (st.st_dev, st.st_ino)
+        self.position = 0
+        self.buffer.reset()
+        return True
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _check_replaced(self):
+        """
+        Reopen the file if it was rotated or truncated.
+        Returns True if reading should start over right away.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        if (st.st_dev, st.st_ino) != self.identity:
+            self._close()
+            return self._open()
+        if st.st_size < self.position:
+            self.file.seek(0)
+            self.position = 0
+            self.buffer.reset()
+            return True
+        return False
+
+    def _wait(self, interval):
+        if self.watch is not None:
+            self.watch.wait(self.inotify_timeout)
+            return self.min_interval
+        time.sleep(interval)
+        return min(interval * 2, self.max_interval)
+
+    def __iter__(self):
+        interval = self.min_interval
+        try:
+            while True:
+                if self.file is None and not self._open():
+                    interval = self._wait(interval)
+                    continue
+                n = self.buffer.read_from(self.file)
+                if n:
+                    self.position += n
+                    interval = self.min_interval
+                    yield from self.buffer.lines()
+                    continue
+                if not self._check_replaced():
+                    interval = self._wait(interval)
+        finally:
+            self._close()
+            if self.watch is not None:
+                self.watch.close()
+
+
 def tail_file(file_path):
     """
     Generator that yields new lines appended to the file.
-    Uses polling via os.stat to detect file changes.
+    See LogTailer for how changes are detected.
     """
-    last_position = 0
-    buffer = ""
-    while True:
-        try:
-            current_size = os.stat(file_path).st_size
-        except Exception:
-            time.sleep(0.5)
-            continue
-        if current_size < last_position:
-            last_position = 0  # file was truncated
-        if current_size > last_position:
+    yield from LogTailer(file_path)
+
+
+class DevServerReadiness:
+    """
+    Tracks the lifecycle of each dev server run and records how long it takes:
+      - spawn_to_ready_log: spawn until the "Ready"/"compiled" log line
+      - spawn_to_ready: spawn until the port accepts a TCP connection
+      - ready_to_first_200: ready until the first successful response
+      - crash_to_restart: the server exiting on its own until the next spawn
+    Durations go to `analytics` as dev server metrics. Repeated crashes (exits
+    within STABLE_UPTIME of becoming ready) back off exponentially with
+    jitter.
+    """
+
+    READY_PATTERN = re.compile(r"\bready\b|\bcompiled\b", re.IGNORECASE)
+    STABLE_UPTIME = 60.0
+
+    def __init__(
+        self,
+        port,
+        analytics=None,
+        probe_interval=0.25,
+        backoff_base=1.0,
+        backoff_max=30.0,
+    ):
+        self.port = port
+        self.analytics = analytics
+        self.probe_interval = probe_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock = threading.Lock()
+        self.ready_log = threading.Event()
+        self.generation = 0
+        self.spawn_time = None
+        self.ready_time = None
+        self.log_seen = False
+        self.first_ok_seen = False
+        self.crash_time = None
+        self.crashes = 0
+
+    def _record(self, name, seconds):
+        if self.analytics is not None:
+            self.analytics.record_metric(name, seconds * 1000)
+
+    def spawned(self):
+        """
+        Call right after a dev server process was started.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.spawn_time = now
+            self.ready_time = None
+            self.log_seen = False
+            self.first_ok_seen = False
+            self.ready_log.clear()
+            if self.crash_time is not None:
+                self._record("crash_to_restart", now - self.crash_time)
+                self.crash_time = None
+        threading.Thread(
+            target=self._probe, args=(generation,), daemon=True
+        ).start()
+
+    def exited(self, crashed):
+        """
+        Call once the dev server process is gone. `crashed` means it exited
+        on its own rather than being stopped by us.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.generation += 1
+            self.ready_log.set()  # wake the probe so it notices
+            if not crashed:
+                self.crashes = 0
+                return
+            self.crash_time = now
+            stable = (
+                self.ready_time is not None
+                and now - self.ready_time >= self.STABLE_UPTIME
+            )
+            self.crashes = 1 if stable else self.crashes + 1
+
+    def backoff_delay(self):
+        """
+        Seconds to wait before the next restart: 0 after a clean stop,
+        otherwise exponential in the number of consecutive crashes, with
+        jitter so the delay lands between half and all of that.
+        """
+        if not self.crashes:
+            return 0.0
+        delay = min(
+            self.backoff_max, self.backoff_base * 2 ** (self.crashes - 1)
+        )
+        return random.uniform(delay / 2, delay)
+
+    def on_log_line(self, line):
+        if self.log_seen or self.spawn_time is None:
+            return
+        if self.READY_PATTERN.search(line):
+            with self.lock:
+                if self.log_seen:
+                    return
+                self.log_seen = True
+                self._record(
+                    "spawn_to_ready_log", time.monotonic() - self.spawn_time
+                )
+            # Probe right away instead of at the next interval.
+            self.ready_log.set()
+
+    def on_response(self, status):
+        if self.first_ok_seen or not status.startswith("2"):
+            return
+        now = time.monotonic()
+        with self.lock:
+            if self.first_ok_seen or self.spawn_time is None:
+                return
+            self.first_ok_seen = True
+            if self.ready_time is None:
+                # Answered before the probe got through: it is ready now.
+                self._mark_ready(now)
+            self._record("ready_to_first_200", now - self.ready_time)
+
+    def _mark_ready(self, now):
+        self.ready_time = now
+        elapsed = now - self.spawn_time
+        self._record("spawn_to_ready", elapsed)
+        print(f"Dev server ready on port {self.port} in {elapsed:.2f}s")
+
+    def _probe(self, generation):
+        while True:
+            if self.ready_log.wait(self.probe_interval):
+                self.ready_log.clear()
+            if generation != self.generation:
+                return
             try:
-                with open(
-                    file_path, "r", encoding="utf-8", errors="replace"
-                ) as f:
-                    f.seek(last_position)
-                    new_data = f.read()
-                    last_position = f.tell()
-                    buffer += new_data
-                    lines = buffer.splitlines(keepends=True)
-                    if lines and not lines[-1].endswith("\n"):
-                        buffer = lines.pop()
-                    else:
-                        buffer = ""
-                    for line in lines:
-                        yield line
-            except Exception as e:
-                print(f"Error reading file: {e}", file=sys.stderr)
-        time.sleep(0.1)
+                with socket.create_connection(
+                    ("localhost", self.port), timeout=0.5
+                ):
+                    pass
+            except OSError:
+                continue
+            now = time.monotonic()
+            with self.lock:
+                if generation == self.generation and self.ready_time is None:
+                    self._mark_ready(now)
+            return
 
 
-def tail_log_thread(pattern):
+def process_log_line(line, pattern, analytics=None, readiness=None):
+    """
+    Echoes one dev server output line and plays the alert (picked by status and
+    latency) if it is an HTTP log line matching `pattern`. The route, status
+    and duration of a match are recorded in `analytics` if given, and the line
+    is passed to `readiness` to detect when the server is up.
+    """
+    sys.stdout.write(line)
+    match = pattern.search(line)
+    if match:
+        route, status, duration = match.groups()
+        if analytics is not None:
+            analytics.record(route, status, int(duration))
+        if readiness is not None:
+            readiness.on_response(status)
+        play_sound(tone_for_response(status, int(duration)))
+    elif readiness is not None:
+        readiness.on_log_line(line)
+
+
+def tail_log_thread(pattern, analytics=None, readiness=None):
     """
     Continuously tails the log file.
     Prints each new line and triggers play_sound() if the line matches the HTTP log pattern.
@@ -173,75 +740,386 @@ def tail_log_thread(pattern):
     while True:
         try:
             for line in tail_file(LOG_FILE):
-                sys.stdout.write(line)
+                process_log_line(line, pattern, analytics, readiness)
                 sys.stdout.flush()
-                if pattern.search(line):
-                    play_sound()
         except Exception as e:
             print(f"Error in tail_log_thread: {e}", file=sys.stderr)
         time.sleep(1)
 
 
-def kill_process_tree(pid):
+class RotatingLogTee:
     """
-    Kills the process with the given PID and all its children.
+    Copies dev server output to a size-rotated log file on a background
+    thread, so the reader of the pipe never waits on disk I/O.
+    When `path` exceeds `max_bytes`, it is renamed to path.1 (shifting older
+    copies up to path.<backups>) and a new file is started.
     """
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.SimpleQueue()
+        self.file = None
+        self.size = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        self.queue.put(data)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _open(self):
+        self.file = open(self.path, "ab")
+        self.size = self.file.tell()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _run(self):
+        try:
+            self._open()
+        except OSError as e:
+            print(f"Could not open {self.path}: {e}", file=sys.stderr)
+            return
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            # Coalesce everything queued so far into one write.
+            chunks = [data]
+            while True:
+                try:
+                    data = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if data is None:
+                    self.queue.put(None)
+                    break
+                chunks.append(data)
+            try:
+                data = b"".join(chunks)
+                self.file.write(data)
+                self.file.flush()
+                self.size += len(data)
+                if self.size >= self.max_bytes:
+                    self._rotate()
+            except OSError as e:
+                print(f"Error writing {self.path}: {e}", file=sys.stderr)
+        self.file.close()
+
+
+def read_dev_server_output(
+    process, pattern, tee=None, analytics=None, readiness=None
+):
+    """
+    Reads the dev server's stdout pipe directly (pipe capture mode), runs each
+    line through process_log_line, and hands the raw bytes to `tee` if given.
+    Returns when the pipe closes.
+    """
+    buffer = LineBuffer()
+    pipe = process.stdout.raw
+    try:
+        while True:
+            n = buffer.read_from(pipe)
+            if not n:
+                break
+            if tee is not None:
+                with memoryview(buffer.buffer) as view:
+                    tee.write(bytes(view[buffer.end - n : buffer.end]))
+            for line in buffer.lines():
+                process_log_line(line, pattern, analytics, readiness)
+            sys.stdout.flush()
+    except Exception as e:
+        print(f"Error reading dev server output: {e}", file=sys.stderr)
+    finally:
+        process.stdout.close()
+
+
+def signal_process_group(pid):
+    """
+    Asks the process group led by `pid` to shut down: CTRL_BREAK_EVENT on
+    Windows (the dev server is started with CREATE_NEW_PROCESS_GROUP), SIGTERM
+    to the group elsewhere. Returns False if `pid` does not lead its own group,
+    so the caller has to signal the processes one by one.
+    """
+    try:
+        if sys.platform == "win32":
+            os.kill(pid, signal.CTRL_BREAK_EVENT)
+            return True
+        pgid = os.getpgid(pid)
+        if pgid != pid or pgid == os.getpgid(0):
+            return False
+        os.killpg(pgid, signal.SIGTERM)
+        return True
+    except OSError:
+        return False
+
+
+def terminate_process_tree(pid, timeout=5.0):
+    """
+    Gracefully stops the process with the given PID and all its children.
+    The whole tree is signalled at once, then given up to `timeout` seconds to
+    exit; only processes still running after that are killed.
+    Returns a dict with the number of processes that exited gracefully or had
+    to be killed, and the time each phase took in seconds.
+    """
+    start = time.monotonic()
+    timings = {"exited": 0, "killed": 0, "graceful_s": 0.0, "total_s": 0.0}
     try:
         parent = psutil.Process(pid)
+        procs = parent.children(recursive=True) + [parent]
     except psutil.NoSuchProcess:
-        return
-    for child in parent.children(recursive=True):
+        return timings
+
+    if not signal_process_group(pid):
+        for proc in procs:
+            try:
+                proc.terminate()
+            except psutil.NoSuchProcess:
+                pass
+    gone, alive = psutil.wait_procs(procs, timeout=timeout)
+    timings["exited"] = len(gone)
+    timings["graceful_s"] = time.monotonic() - start
+
+    for proc in alive:
         try:
-            child.kill()
-        except Exception:
+            proc.kill()
+        except psutil.NoSuchProcess:
             pass
-    try:
-        parent.kill()
-    except Exception:
-        pass
+    if alive:
+        psutil.wait_procs(alive, timeout=timeout)
+    timings["killed"] = len(alive)
+    timings["total_s"] = time.monotonic() - start
+    return timings
+
+
+def wait_for_port_release(port, timeout=10.0, interval=0.05):
+    """
+    Waits until nothing accepts connections on localhost:`port`.
+    Returns the seconds waited, or None if the port was still in use after
+    `timeout` seconds.
+    """
+    start = time.monotonic()
+    while True:
+        try:
+            with socket.create_connection(("localhost", port), timeout=0.5):
+                pass
+        except OSError:
+            return time.monotonic() - start
+        if time.monotonic() - start >= timeout:
+            return None
+        time.sleep(interval)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run the Next.js dev server and play a sound when "
+        "pages finish loading."
+    )
+    parser.add_argument(
+        "--capture",
+        choices=["file", "pipe"],
+        default="file",
+        help=f"'file' (default): the shell writes output to {LOG_FILE} and it "
+        "is tailed. 'pipe': read the dev server's stdout directly and copy it "
+        "to --log-file in the background.",
+    )
+    parser.add_argument(
+        "--log-file",
+        default=LOG_FILE,
+        help="Rotating copy of the output in pipe mode ('' to disable).",
+    )
+    parser.add_argument(
+        "--log-max-bytes",
+        type=int,
+        default=LOG_MAX_BYTES,
+        help="Rotate the pipe-mode log file once it reaches this size.",
+    )
+    parser.add_argument(
+        "--log-backups",
+        type=int,
+        default=LOG_BACKUPS,
+        help="Number of rotated pipe-mode log files to keep.",
+    )
+    parser.add_argument(
+        "--stats-file",
+        default=STATS_FILE,
+        help="Per-route latency snapshot, merged on start ('' to disable).",
+    )
+    parser.add_argument(
+        "--snapshot-interval",
+        type=float,
+        default=SNAPSHOT_INTERVAL,
+        help="Seconds between latency snapshot writes.",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="Print the per-route latency report from --stats-file and exit.",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEV_SERVER_PORT,
+        help="Port the dev server listens on.",
+    )
+    parser.add_argument(
+        "--stop-timeout",
+        type=float,
+        default=5.0,
+        help="Seconds to wait for a graceful shutdown (and for the port to "
+        "be released) before escalating.",
+    )
+    parser.add_argument(
+        "--backoff-base",
+        type=float,
+        default=1.0,
+        help="Restart delay after the first of several consecutive crashes; "
+        "doubles with every further crash.",
+    )
+    parser.add_argument(
+        "--backoff-max",
+        type=float,
+        default=30.0,
+        help="Upper bound for the restart delay after repeated crashes.",
+    )
+    parser.add_argument(
+        "--scan-orphans",
+        action="store_true",
+        help="Also scan the process table for orphaned dev servers, not "
+        "just the ones in the PID registry.",
+    )
+    parser.add_argument(
+        "--alert-debounce",
+        type=float,
+        default=0.25,
+        help="Seconds after an alert within which further matches are coalesced.",
+    )
+    parser.add_argument(
+        "--max-voices",
+        type=int,
+        default=2,
+        help="Maximum number of alerts sounding at the same time.",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+
+    analytics = LatencyAnalytics(args.stats_file, args.snapshot_interval)
+    if args.report:
+        print(analytics.report())
+        return
+    atexit.register(analytics.snapshot)
+    start_alert_player(args.alert_debounce, args.max_voices)
+
+    readiness = DevServerReadiness(
+        args.port,
+        analytics,
+        backoff_base=args.backoff_base,
+        backoff_max=args.backoff_max,
+    )
+
     # First, clean up orphaned dev server processes.
-    cleanup_orphaned_dev_servers()
+    cleanup_orphaned_dev_servers(True if args.scan_orphans else None)
 
     # Compile regex to match HTTP log lines (e.g., "GET /app 200 in 37800ms")
     pattern = re.compile(r"GET\s+(/[\S]*)\s+(\d{3})\s+in\s+(\d+)ms")
 
-    # Start the tailing thread once as a daemon.
-    tail_thread = threading.Thread(
-        target=tail_log_thread, args=(pattern,), daemon=True
-    )
-    tail_thread.start()
+    tee = None
+    if args.capture == "pipe":
+        if args.log_file:
+            tee = RotatingLogTee(
+                args.log_file, args.log_max_bytes, args.log_backups
+            )
+    else:
+        # Start the tailing thread once as a daemon.
+        tail_thread = threading.Thread(
+            target=tail_log_thread,
+            args=(pattern, analytics, readiness),
+            daemon=True,
+        )
+        tail_thread.start()
 
     # Main loop: continuously start and monitor the dev server.
     while True:
-        dev_process = start_dev_server()
-        if dev_process is None:
+        delay = readiness.backoff_delay()
+        if delay:
             print(
-                "Dev server failed to start; retrying in 5 seconds...",
+                f"Dev server crashed {readiness.crashes} time(s) in a row; "
+                f"restarting in {delay:.1f}s...",
                 file=sys.stderr,
             )
-            time.sleep(5)
+            time.sleep(delay)
+        dev_process = start_dev_server(args.capture)
+        if dev_process is None:
+            print("Dev server failed to start.", file=sys.stderr)
+            readiness.exited(crashed=True)
             continue
+        readiness.spawned()
+        # The first hit of every route after a restart includes compilation.
+        analytics.mark_restart()
+        if args.capture == "pipe":
+            threading.Thread(
+                target=read_dev_server_output,
+                args=(dev_process, pattern, tee, analytics, readiness),
+                daemon=True,
+            ).start()
 
         print("Monitoring dev server process...")
+        crashed = False
         try:
-            while dev_process.poll() is None:
-                time.sleep(1)
+            while True:
+                try:
+                    # A short timeout keeps Ctrl+C responsive on Windows.
+                    dev_process.wait(timeout=0.25)
+                    break
+                except subprocess.TimeoutExpired:
+                    continue
+            crashed = True
             print(
                 "Dev server process terminated; restarting...", file=sys.stderr
             )
         except Exception as e:
             print(f"Error in monitoring loop: {e}", file=sys.stderr)
         finally:
+            readiness.exited(crashed)
             try:
                 if dev_process and dev_process.poll() is None:
-                    kill_process_tree(dev_process.pid)
-                    dev_process.wait(timeout=5)
+                    timings = terminate_process_tree(
+                        dev_process.pid, args.stop_timeout
+                    )
+                    print(
+                        f"Stopped dev server tree in {timings['total_s']:.2f}s "
+                        f"({timings['exited']} exited, "
+                        f"{timings['killed']} killed)"
+                    )
             except Exception as e:
                 print(f"Error during cleanup: {e}", file=sys.stderr)
-        time.sleep(1)  # Brief pause before restarting.
+            DEV_SERVER_REGISTRY.unregister(dev_process.pid)
+        # Restart as soon as the old server has released its port.
+        waited = wait_for_port_release(args.port, args.stop_timeout)
+        if waited is None:
+            print(
+                f"Port {args.port} is still in use; cleaning up orphans...",
+                file=sys.stderr,
+            )
+            cleanup_orphaned_dev_servers(scan=True)
+            wait_for_port_release(args.port, args.stop_timeout)
 
 
 if __name__ == "__main__":
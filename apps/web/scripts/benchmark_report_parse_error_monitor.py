@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+benchmark_report_parse_error_monitor.py
+
+Benchmarks for report_parse_error_monitor.py that run without a live dev server.
+
+  grouping   Replays a log (recorded or synthetic, 100k lines by default) through
+             ReportParseErrorMonitor.reportError and prints the per-line cost for
+             every slice of the log next to the number of groups at that point.
+             With the indexed grouping the cost per line should stay flat while
+             the group count keeps growing.
+  classifier Compares lines/sec of classify_line against the previous trigger
+             regex + extractErrorType chain on a recorded `pnpm run dev` log (or
+             a synthetic one), and checks that both produce the same error types.
+  files      Builds a FileNameIndex (over a real tree, or 200k synthetic entries)
+             and times get_module_files_info-style substring queries.
+  replay     Generates synthetic workloads (an error storm, many distinct errors,
+             long stack traces), replays each through the --replay pipeline
+             (process_stream -> reportError) in a fresh process, and reports
+             lines/sec, p50/p99 per-line latency, peak RSS and group counts.
+
+Usage:
+    python benchmark_report_parse_error_monitor.py grouping [--lines 100000] [--log FILE]
+    python benchmark_report_parse_error_monitor.py classifier [--lines 200000] [--log FILE]
+    python benchmark_report_parse_error_monitor.py files [--entries 200000] [--root DIR]
+    python benchmark_report_parse_error_monitor.py replay [--lines 100000] [--workload NAME ...]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from report_parse_error_monitor import (
+    FileNameIndex,
+    ReplayStream,
+    ReportParseErrorMonitor,
+    ReportSink,
+    classify_line,
+    process_stream,
+)
+
+MODULES = [
+    "Unknown module",
+    "./src/app/page.tsx",
+    "./node_modules/react-native-web/dist/index.js",
+]
+
+STORM_TEMPLATES = [
+    "TypeError: Cannot read properties of undefined (reading 'x{n}') at {path}:{n}:{n}",
+    "Module not found: Can't resolve '{path}' in '{path}'",
+    "ReferenceError: window is not defined (chunk {hash}) after {n}ms",
+    "SyntaxError: Unexpected token '<' in {path} at line {n}",
+]
+
+
+def _random_path(rng: random.Random) -> str:
+    depth = rng.randint(2, 5)
+    parts = [f"dir{rng.randint(0, 999)}" for _ in range(depth)]
+    return "/".join(parts) + f"/file{rng.randint(0, 9999)}.tsx"
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        n=rng.randint(0, 99999),
+        path=_random_path(rng),
+        hash=f"{rng.getrandbits(48):012x}",
+    )
+
+
+def synthetic_log(
+    total_lines: int, distinct_ratio: float, seed: int = 1
+) -> list:
+    """
+    Build a list of (module, message) pairs. Most lines repeat a storm template
+    with fresh numbers, paths and hashes; a `distinct_ratio` fraction are new,
+    unrelated messages that each create a new group.
+    """
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+        for _ in range(5000)
+    ]
+    lines = []
+    for _ in range(total_lines):
+        module = rng.choice(MODULES)
+        if rng.random() < distinct_ratio:
+            words = " ".join(rng.sample(vocabulary, 8))
+            message = f"TypeError: {words}"
+        else:
+            message = _fill(rng.choice(STORM_TEMPLATES), rng)
+        lines.append((module, message))
+    return lines
+
+
+def recorded_log(path: str) -> list:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return [("Unknown module", line.strip()) for line in f if line.strip()]
+
+
+DEV_LOG_TEMPLATES = [
+    "  next:router-server:main requested {path} +{n}ms",
+    "  next:start-server handling request {n} for {path}",
+    " ○ Compiling {path} ...",
+    " ✓ Compiled {path} in {n}ms ({n} modules)",
+    " GET /{word} 200 in {n}ms",
+    "  babel:config:loading-files loaded {path} +{n}ms",
+    "  webpack:tapable metadata for {path} updated",
+    "Module not found: Can't resolve '{path}'",
+    "TypeError: Cannot read properties of undefined (reading '{word}')",
+    "    at {word} ({path}:{n}:{n})",
+    "SyntaxError: Unexpected token '<' in {path}",
+    "ProxyNativeModule is not defined (ReferenceError) in {path}",
+]
+
+LEGACY_TRIGGER = (
+    r"SyntaxError|Module not found|Unexpected token|ReferenceError|TypeError|"
+    r"RangeError|UndefinedPropertyError|HookRegistrationError|ProxyNativeModule"
+)
+
+
+def legacy_classify_line(line: str):
+    """
+    The classification path used before classify_line: a trigger regex followed
+    by the extractErrorType if/elif chain.
+    """
+    if not re.search(LEGACY_TRIGGER, line, re.I):
+        return None
+    message = line
+    errorType = "UnknownError"
+    if re.search(r"ProxyNativeModule", message, re.I):
+        errorType = "BabelScopeError"
+    elif re.search(r"Module not found", message, re.I):
+        errorType = "ModuleNotFoundError"
+    elif re.search(r"Unexpected token", message, re.I):
+        errorType = "SyntaxError"
+    elif re.search(r"cannot read properties of undefined", message, re.I):
+        errorType = "UndefinedPropertyError"
+    elif re.search(r"tap", message, re.I):
+        errorType = "HookRegistrationError"
+    elif re.search(r"ReferenceError", message, re.I):
+        errorType = "ReferenceError"
+    elif re.search(r"TypeError", message, re.I):
+        errorType = "TypeError"
+    elif re.search(r"RangeError", message, re.I):
+        errorType = "RangeError"
+    else:
+        m = re.match(r"^([A-Za-z]+Error)", message)
+        if m:
+            errorType = m.group(1)
+    return errorType
+
+
+def synthetic_dev_log(total_lines: int, seed: int = 1) -> list:
+    """
+    Build lines resembling `DEBUG=* pnpm run dev` output, where only a small
+    fraction of lines are errors.
+    """
+    rng = random.Random(seed)
+    words = ["welcome", "profile", "chat", "events", "feed", "settings"]
+    lines = []
+    for _ in range(total_lines):
+        template = rng.choices(
+            DEV_LOG_TEMPLATES, weights=[30, 20, 5, 5, 10, 20, 4, 1, 1, 2, 1, 1]
+        )[0]
+        lines.append(
+            template.format(
+                n=rng.randint(0, 99999),
+                path=_random_path(rng),
+                word=rng.choice(words),
+            )
+        )
+    return lines
+
+
+def bench_classifier(args):
+    if args.log:
+        with open(args.log, "r", encoding="utf-8", errors="replace") as f:
+            lines = [line.strip() for line in f]
+    else:
+        lines = synthetic_dev_log(args.lines)
+
+    results = {}
+    for name, classify in (
+        ("legacy", legacy_classify_line),
+        ("classify_line", classify_line),
+    ):
+        best = float("inf")
+        for _ in range(args.repeat):
+            began = time.perf_counter()
+            output = [classify(line) for line in lines]
+            best = min(best, time.perf_counter() - began)
+        results[name] = output
+        print(f"{name:>14}: {len(lines) / best:>12,.0f} lines/sec")
+
+    mismatches = [
+        (line, old, new)
+        for line, old, new in zip(
+            lines, results["legacy"], results["classify_line"]
+        )
+        if old != new
+    ]
+    reported = sum(1 for t in results["classify_line"] if t is not None)
+    print(f"{reported} of {len(lines)} lines classified as errors")
+    for line, old, new in mismatches[:10]:
+        print(f"MISMATCH legacy={old} new={new}: {line}")
+    if mismatches:
+        sys.exit(1)
+
+
+def bench_grouping(args):
+    if args.log:
+        lines = recorded_log(args.log)
+    else:
+        lines = synthetic_log(args.lines, args.distinct_ratio)
+
+    monitor = ReportParseErrorMonitor({"verbose": False})
+    slice_size = max(1, len(lines) // args.slices)
+
+    print(f"{'lines':>10} {'groups':>8} {'us/line':>10}")
+    with open(os.devnull, "w") as devnull:
+        for start in range(0, len(lines), slice_size):
+            chunk = lines[start : start + slice_size]
+            began = time.perf_counter()
+            with contextlib.redirect_stdout(devnull):
+                for module, message in chunk:
+                    monitor.reportError(message, moduleResource=module)
+            elapsed = time.perf_counter() - began
+            print(
+                f"{start + len(chunk):>10} {len(monitor.errorGroups):>8} "
+                f"{elapsed / len(chunk) * 1e6:>10.1f}"
+            )
+
+
+def synthetic_file_index(total_entries: int, seed: int = 1) -> FileNameIndex:
+    """
+    Fill a FileNameIndex with `total_entries` generated paths, without
+    touching the filesystem.
+    """
+    rng = random.Random(seed)
+    stems = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+        for _ in range(20000)
+    ]
+    extensions = [".ts", ".tsx", ".js", ".json", ".md", ".png"]
+    index = FileNameIndex(".")
+    for _ in range(total_entries):
+        directory = os.path.join(*rng.sample(stems, rng.randint(1, 4)))
+        name = (
+            rng.choice(stems) + rng.choice(["", "-", "_"]) + rng.choice(stems)
+        )
+        index._add_entry(
+            os.path.join(directory, name + rng.choice(extensions)),
+            name + rng.choice(extensions),
+        )
+    index._built = True
+    index._last_refresh = float("inf")
+    return index
+
+
+def bench_files(args):
+    began = time.perf_counter()
+    if args.root:
+        index = FileNameIndex(args.root)
+        index.build()
+    else:
+        index = synthetic_file_index(args.entries)
+    print(
+        f"indexed {len(index.paths)} entries in "
+        f"{time.perf_counter() - began:.2f}s"
+    )
+
+    rng = random.Random(2)
+    names = list(index.ids_by_name)
+    keywords = ["welcome", "page", "index", "settings"]
+    for _ in range(args.queries):
+        name = rng.choice(names).rsplit(".", 1)[0]
+        start = rng.randint(0, max(0, len(name) - 5))
+        keywords.append(name[start : start + rng.randint(5, 9)])
+
+    timings = []
+    matches = 0
+    for keyword in keywords:
+        began = time.perf_counter()
+        matches += len(index.query(keyword))
+        timings.append(time.perf_counter() - began)
+    timings.sort()
+    print(
+        f"{len(keywords)} queries, {matches} matches: "
+        f"p50 {timings[len(timings) // 2] * 1e3:.3f}ms, "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1e3:.3f}ms, "
+        f"max {timings[-1] * 1e3:.3f}ms"
+    )
+
+
+def _storm_workload(rng: random.Random, total_lines: int):
+    """
+    Debug noise with a few errors repeating over and over.
+    """
+    for _ in range(total_lines):
+        if rng.random() < 0.3:
+            yield _fill(rng.choice(STORM_TEMPLATES), rng)
+        else:
+            yield _fill(DEV_LOG_TEMPLATES[0], rng)
+
+
+def _distinct_workload(rng: random.Random, total_lines: int):
+    """
+    Debug noise with a steady stream of errors that are all different.
+    """
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+        for _ in range(5000)
+    ]
+    for _ in range(total_lines):
+        if rng.random() < 0.2:
+            yield "TypeError: " + " ".join(rng.sample(vocabulary, 8))
+        else:
+            yield _fill(DEV_LOG_TEMPLATES[1], rng)
+
+
+def _stacktrace_workload(rng: random.Random, total_lines: int):
+    """
+    Errors followed by long stack traces.
+    """
+    emitted = 0
+    while emitted < total_lines:
+        yield _fill(rng.choice(STORM_TEMPLATES), rng)
+        depth = rng.randint(20, 60)
+        for _ in range(depth):
+            yield (
+                f"    at fn{rng.randint(0, 500)} ({_random_path(rng)}:"
+                f"{rng.randint(1, 999)}:{rng.randint(1, 80)})"
+            )
+        emitted += depth + 1
+
+
+REPLAY_WORKLOADS = {
+    "storm": _storm_workload,
+    "distinct": _distinct_workload,
+    "stacktraces": _stacktrace_workload,
+}
+
+
+class TimedReplayStream(ReplayStream):
+    """
+    ReplayStream that records how long the pipeline spent on each line: the
+    time between returning a line and being asked for the next one.
+    """
+
+    def __init__(self, path: str, speed: float = None):
+        super().__init__(path, speed)
+        self.latencies = []
+        self._returned_at = None
+
+    def readline(self) -> str:
+        now = time.perf_counter()
+        if self._returned_at is not None:
+            self.latencies.append(now - self._returned_at)
+        line = super().readline()
+        self._returned_at = time.perf_counter()
+        return line
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def bench_replay_one(args):
+    """
+    Child process for `replay`: generate one workload, replay it, and print
+    the measurements as JSON.
+    """
+    rng = random.Random(args.seed)
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".log", delete=False, encoding="utf-8"
+    ) as f:
+        for line in REPLAY_WORKLOADS[args.workload](rng, args.lines):
+            f.write(line + "\n")
+        path = f.name
+    try:
+        monitor = ReportParseErrorMonitor(
+            {
+                "verbose": False,
+                "format": "ndjson",
+                "sink": ReportSink(os.devnull),
+            }
+        )
+        stream = TimedReplayStream(path)
+        began = time.perf_counter()
+        process_stream(stream, monitor, echo=False)
+        elapsed = time.perf_counter() - began
+        monitor.close()
+    finally:
+        os.remove(path)
+
+    latencies = sorted(stream.latencies)
+    print(
+        json.dumps(
+            {
+                "workload": args.workload,
+                "lines": len(latencies),
+                "lines_per_sec": len(latencies) / elapsed,
+                "p50_us": latencies[len(latencies) // 2] * 1e6,
+                "p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+                "peak_rss_mb": (
+                    _peak_rss_bytes() / 2**20 if resource is not None else None
+                ),
+                "groups": len(monitor.errorGroups),
+                "evicted_groups": sum(
+                    totals["groups"]
+                    for totals in monitor.errorGroups.evicted.values()
+                ),
+            }
+        )
+    )
+
+
+def bench_replay(args):
+    print(
+        f"{'workload':>12} {'lines':>8} {'lines/s':>10} {'p50 us':>8} "
+        f"{'p99 us':>8} {'rss MB':>7} {'groups':>7} {'evicted':>8}"
+    )
+    for workload in args.workload or list(REPLAY_WORKLOADS):
+        result = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "replay-one",
+                "--workload",
+                workload,
+                "--lines",
+                str(args.lines),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        r = json.loads(result.stdout.strip().splitlines()[-1])
+        rss = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] else "n/a"
+        print(
+            f"{r['workload']:>12} {r['lines']:>8} {r['lines_per_sec']:>10,.0f} "
+            f"{r['p50_us']:>8.1f} {r['p99_us']:>8.1f} {rss:>7} "
+            f"{r['groups']:>7} {r['evicted_groups']:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for report_parse_error_monitor.py."
+    )
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    grouping = subparsers.add_parser(
+        "grouping", help="Per-line reportError cost as the group count grows."
+    )
+    grouping.add_argument("--lines", type=int, default=100_000)
+    grouping.add_argument(
+        "--distinct-ratio",
+        type=float,
+        default=0.05,
+        help="Fraction of synthetic lines that start a new group.",
+    )
+    grouping.add_argument(
+        "--slices", type=int, default=10, help="Number of reported slices."
+    )
+    grouping.add_argument(
+        "--log", help="Replay a recorded log instead of synthetic lines."
+    )
+    grouping.set_defaults(func=bench_grouping)
+
+    classifier = subparsers.add_parser(
+        "classifier", help="Lines/sec of classify_line vs. the legacy path."
+    )
+    classifier.add_argument("--lines", type=int, default=200_000)
+    classifier.add_argument(
+        "--repeat", type=int, default=3, help="Best-of-N timing runs."
+    )
+    classifier.add_argument(
+        "--log", help="A recorded `pnpm run dev` log to classify."
+    )
+    classifier.set_defaults(func=bench_classifier)
+
+    files = subparsers.add_parser(
+        "files", help="FileNameIndex build time and query latency."
+    )
+    files.add_argument("--entries", type=int, default=200_000)
+    files.add_argument("--queries", type=int, default=1000)
+    files.add_argument(
+        "--root", help="Index this directory instead of synthetic entries."
+    )
+    files.set_defaults(func=bench_files)
+
+    replay = subparsers.add_parser(
+        "replay", help="Replay synthetic workloads through the monitor."
+    )
+    replay.add_argument("--lines", type=int, default=100_000)
+    replay.add_argument(
+        "--workload",
+        action="append",
+        choices=list(REPLAY_WORKLOADS),
+        help="Workload to run (repeatable; default: all).",
+    )
+    replay.set_defaults(func=bench_replay)
+
+    replay_one = subparsers.add_parser("replay-one")
+    replay_one.add_argument(
+        "--workload", choices=list(REPLAY_WORKLOADS), required=True
+    )
+    replay_one.add_argument("--lines", type=int, default=100_000)
+    replay_one.add_argument("--seed", type=int, default=1)
+    replay_one.set_defaults(func=bench_replay_one)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -4,15 +4,151 @@ import sys
 import os
 import re
 import shutil
+import stat
+import atexit
+import queue
+import argparse
+import threading
+import contextlib
+import hashlib
+import json
+import time
+import signal
+import csv
+import statistics
+import math
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-# Path to your Next.js config file (TypeScript)
-CONFIG_PATH = os.path.join(os.getcwd(), "next.config.ts")
-BACKUP_PATH = os.path.join(os.getcwd(), "next.config.ts.bak")
+import config_blocks
+from config_blocks import Block
+
+# The Next.js app being bisected (the directory the script is run from).
+APP_DIR = os.getcwd()
+
+# Path to your Next.js config file (TypeScript preferred, JavaScript as fallback)
+CONFIG_NAMES = ["next.config.ts", "next.config.mjs", "next.config.js"]
+CONFIG_NAME = next(
+    (n for n in CONFIG_NAMES if os.path.exists(os.path.join(APP_DIR, n))),
+    CONFIG_NAMES[0],
+)
+CONFIG_PATH = os.path.join(APP_DIR, CONFIG_NAME)
+BACKUP_PATH = CONFIG_PATH + ".bak"
+# The original config while a run is mutating it in place. If this file is
+# still there on start, the last run was killed and it is restored from here.
+JOURNAL_PATH = CONFIG_PATH + ".bisect-original"
+# Where the working variant is written, unless --apply puts it in the config.
+RESULT_PATH = os.path.join(
+    APP_DIR, "next.config.bisect-result" + os.path.splitext(CONFIG_NAME)[1]
+)
+
+# Overlay mode: trials are written to this file next to the config, whose
+# last lines hand over to it when NEXT_BISECT_CONFIG names it, and build into
+# their own distDir, so the working tree and a running dev server are left
+# alone.
+OVERLAY_NAME = "next.config.bisect.js"
+OVERLAY_ENV = "NEXT_BISECT_CONFIG"
+OVERLAY_DIST_DIR = ".next-bisect"
+OVERLAY_FOOTER = """
+// Added by bisect_next_config_build.py: build into a separate distDir.
+{
+    const bisectConfig = module.exports;
+    const distDir = process.env.NEXT_BISECT_DIST_DIR;
+    module.exports =
+        typeof bisectConfig === 'function'
+            ? async (...args) => ({ ...(await bisectConfig(...args)), distDir })
+            : { ...bisectConfig, distDir };
+}
+"""
 
 # The build command to test the changes.
 BUILD_CMD = ["pnpm.cmd", "run", "build"]
 
-# Define regex patterns to detect common webpack config blocks.
+# Parallel mode: worktrees are created next to the app directory (so relative
+# paths out of it keep working) and link to its node_modules.
+WORKTREE_PREFIX = f".{os.path.basename(APP_DIR)}-bisect-"
+WORKTREE_IGNORE = [
+    "node_modules",
+    ".next",
+    ".git",
+    ".turbo",
+    "*.bak",
+    ".bisect-build-cache.json",
+    ".bisect-timeline.*",
+    "*.bisect-original",
+    "next.config.bisect-result.*",
+    OVERLAY_NAME,
+    OVERLAY_DIST_DIR,
+]
+SHARED_DIRS = ["node_modules"]
+
+# Results of earlier builds, keyed by config contents and lockfile.
+BUILD_CACHE_PATH = os.path.join(APP_DIR, ".bisect-build-cache.json")
+LOCKFILE_NAMES = ["pnpm-lock.yaml", "package-lock.json", "yarn.lock"]
+# How much of a build's output is kept in the cache.
+OUTPUT_TAIL = 4000
+
+# Timings of every trial in the current run.
+TIMELINE_PATH = os.path.join(APP_DIR, ".bisect-timeline.json")
+
+# Lines of `next build` output that start each phase. A phase lasts until the
+# next one starts or the build ends; the time before the first is "startup".
+BUILD_PHASES = [
+    ("compile", re.compile(r"Creating an optimized production build")),
+    ("after compile", re.compile(r"Compiled\b")),
+    ("collect page data", re.compile(r"Collecting page data")),
+    ("generate static pages", re.compile(r"Generating static pages")),
+    ("finalize", re.compile(r"Finalizing page optimization")),
+]
+PHASE_NAMES = ["startup"] + [name for name, _ in BUILD_PHASES]
+
+# What --metric can measure. Times are in seconds, sizes in bytes.
+METRICS = ["build-time", "compile-time", "output-size", "chunk-size"]
+TIME_METRICS = {"build-time", "compile-time"}
+# Two-sided 95% Student's t critical values by degrees of freedom. Between
+# rows the next smaller df is used, which errs towards a wider interval.
+T_95 = {
+    1: 12.71,
+    2: 4.30,
+    3: 3.18,
+    4: 2.78,
+    5: 2.57,
+    6: 2.45,
+    7: 2.36,
+    8: 2.31,
+    9: 2.26,
+    10: 2.23,
+    11: 2.20,
+    12: 2.18,
+    13: 2.16,
+    14: 2.14,
+    15: 2.13,
+    20: 2.09,
+    30: 2.04,
+    40: 2.02,
+    60: 2.00,
+    120: 1.98,
+}
+SIZE_SUFFIXES = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+# cpu_time (s), peak_rss_mb and phases ({name: seconds}) are None where they
+# could not be measured, and in cache entries written before they existed.
+# metric is the measured --metric value of a variant.
+BuildResult = namedtuple(
+    "BuildResult",
+    [
+        "success",
+        "duration",
+        "output",
+        "cpu_time",
+        "peak_rss_mb",
+        "phases",
+        "metric",
+    ],
+    defaults=(None, None, None, None),
+)
+
+# Fallback block detection, used when config_blocks cannot parse the config.
 # These patterns try to capture assignments and push calls on the "config" object.
 BLOCK_PATTERNS = [
     re.compile(
@@ -48,24 +184,707 @@ def read_config():
         return f.readlines()
 
 
-def write_config(lines):
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        f.writelines(lines)
+def write_text_atomic(path, text):
+    """
+    Replace `path` with `text` in one step: a crash leaves either the old or
+    the new contents, never a partly written file.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_config(lines, path=CONFIG_PATH):
+    write_text_atomic(path, "".join(lines))
+
+
+def recover_interrupted_run(path=CONFIG_PATH, journal=JOURNAL_PATH):
+    """
+    Put back the config saved in `journal` by a run that was killed before
+    it could restore it.
+    """
+    if not os.path.exists(journal):
+        return
+    with open(journal, "r", encoding="utf-8") as f:
+        original = f.read()
+    write_text_atomic(path, original)
+    os.remove(journal)
+    print(
+        f"The last run was interrupted; restored {os.path.basename(path)} "
+        f"from {os.path.basename(journal)}."
+    )
+
+
+@contextlib.contextmanager
+def restored_config(path=CONFIG_PATH, journal=JOURNAL_PATH):
+    """
+    Keep the original config in memory (and in `journal`, in case the process
+    is killed outright) and put it back when the block exits, whether it
+    finishes, raises or is interrupted. Yields the original text.
+    """
+    recover_interrupted_run(path, journal)
+    with open(path, "r", encoding="utf-8") as f:
+        original = f.read()
+    write_text_atomic(journal, original)
+    try:
+        yield original
+    finally:
+        with open(path, "r", encoding="utf-8") as f:
+            changed = f.read() != original
+        if changed:
+            write_text_atomic(path, original)
+            print(f"Restored the original {os.path.basename(path)}.")
+        os.remove(journal)
+
+
+# Builds currently running, so they can be stopped when the script exits.
+_active_builds = set()
+_active_builds_lock = threading.Lock()
+
+
+def kill_build(process):
+    """
+    Stop a build and everything it started (pnpm runs next in a child).
+    """
+    try:
+        if sys.platform == "win32":
+            subprocess.run(
+                ["taskkill", "/T", "/F", "/PID", str(process.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+
+def wait_for_build(process):
+    """
+    Reap the build and return its resource usage, or None where that is not
+    available (Windows). os.wait4 gives the same rusage as
+    getrusage(RUSAGE_CHILDREN), but for this build's process tree only: it
+    stays right when several builds run at once, and ru_maxrss is not a
+    high-water mark left behind by an earlier build. Processes killed with
+    an aborted build are not counted.
+    """
+    if hasattr(os, "wait4"):
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            pass  # already reaped by kill_build
+        else:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return usage
+    process.wait()
+    return None
+
 
+def phase_durations(phase_starts, start, end):
+    """
+    {phase: seconds} from the (phase, time) pairs in `phase_starts`.
+    """
+    durations = {}
+    name, begin = "startup", start
+    for next_name, at in phase_starts:
+        durations[name] = round(at - begin, 2)
+        name, begin = next_name, at
+    durations[name] = round(end - begin, 2)
+    return durations
 
-def run_build():
-    print("Running build...")
-    result = subprocess.run(
-        BUILD_CMD, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+
+def describe_timing(result):
+    parts = [f"{result.duration:.0f}s"]
+    if result.cpu_time is not None:
+        parts.append(f"{result.cpu_time:.0f}s CPU")
+    if result.peak_rss_mb is not None:
+        parts.append(f"{result.peak_rss_mb:.0f} MB peak RSS")
+    text = ", ".join(parts)
+    if result.phases:
+        text += "; " + ", ".join(
+            f"{name} {seconds:.0f}s" for name, seconds in result.phases.items()
+        )
+    return text
+
+
+def run_build(cwd=None, failure_pattern=None, pass_pattern=None, env=None):
+    """
+    Run the build and stream its output (stdout and stderr merged).
+    Without patterns, the trial fails if the build exits non-zero. With
+    `failure_pattern`, it fails only if that regex shows up in the output, and
+    the build is stopped as soon as it does. With `pass_pattern`, the build is
+    also stopped, as passed, once that regex shows up before the failure
+    (e.g. a phase that comes after the one where the failure happened).
+    Records wall and CPU time, peak RSS and the duration of every phase in
+    BUILD_PHASES. `env` is added to the build's environment.
+    """
+    print("Running build..." if cwd is None else f"Running build in {cwd}...")
+    process = subprocess.Popen(
+        BUILD_CMD,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=sys.platform != "win32",
+        env=dict(os.environ, **env) if env else None,
+    )
+    with _active_builds_lock:
+        _active_builds.add(process)
+    start = time.monotonic()
+    tail = deque()
+    tail_size = 0
+    matched_failure = matched_pass = False
+    phase_starts = []
+    next_phase = 0
+    usage = None
+    try:
+        for raw_line in process.stdout:
+            line = raw_line.decode("utf-8", "replace")
+            for k in range(next_phase, len(BUILD_PHASES)):
+                if BUILD_PHASES[k][1].search(line):
+                    phase_starts.append((BUILD_PHASES[k][0], time.monotonic()))
+                    next_phase = k + 1
+                    break
+            tail.append(line)
+            tail_size += len(line)
+            while tail_size > OUTPUT_TAIL and len(tail) > 1:
+                tail_size -= len(tail.popleft())
+            if failure_pattern is not None and failure_pattern.search(line):
+                matched_failure = True
+                print("Failure signature seen; stopping the build early.")
+                break
+            if pass_pattern is not None and pass_pattern.search(line):
+                matched_pass = True
+                print("Passed the failing phase; stopping the build early.")
+                break
+        if matched_failure or matched_pass:
+            kill_build(process)
+        process.stdout.close()
+        usage = wait_for_build(process)
+    except BaseException:
+        # The build runs in its own session, so Ctrl+C does not reach it.
+        kill_build(process)
+        raise
+    finally:
+        with _active_builds_lock:
+            _active_builds.discard(process)
+    end = time.monotonic()
+    duration = end - start
+    if matched_failure:
+        success = False
+    elif matched_pass or failure_pattern is not None:
+        success = True
+    else:
+        success = process.returncode == 0
+    cpu_time = peak_rss_mb = None
+    if usage is not None:
+        cpu_time = round(usage.ru_utime + usage.ru_stime, 2)
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+        scale = 1 << 20 if sys.platform == "darwin" else 1 << 10
+        peak_rss_mb = round(usage.ru_maxrss / scale, 1)
+    result = BuildResult(
+        success,
+        duration,
+        "".join(tail),
+        cpu_time,
+        peak_rss_mb,
+        phase_durations(phase_starts, start, end),
     )
-    success = result.returncode == 0
     if success:
-        print("Build succeeded.")
+        print(f"Build succeeded ({describe_timing(result)}).")
     else:
-        print("Build failed.")
+        print(f"Build failed ({describe_timing(result)}).")
         # Uncomment the next line to see error details:
-        # print(result.stderr.decode("utf-8"))
-    return success
+        # print(result.output)
+    return result
+
+
+def stop_active_builds():
+    with _active_builds_lock:
+        processes = list(_active_builds)
+    for process in processes:
+        kill_build(process)
+
+
+def find_lockfile(start=APP_DIR):
+    """
+    The nearest lockfile in `start` or one of its parents, or None.
+    """
+    directory = os.path.abspath(start)
+    while True:
+        for name in LOCKFILE_NAMES:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """
+    Persistent build results keyed by a hash of the config text, the
+    lockfile and the build command, so a variant that was already built
+    (in an earlier run, or as part of another subset) is never rebuilt.
+    """
+
+    def __init__(self, path=BUILD_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        lockfile = find_lockfile()
+        self.lockfile_hash = file_hash(lockfile) if lockfile else ""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def key(self, config_text, *extra):
+        digest = hashlib.sha256()
+        parts = (config_text, self.lockfile_hash, " ".join(BUILD_CMD)) + extra
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return BuildResult(
+            entry["success"],
+            entry["duration"],
+            entry.get("output", ""),
+            entry.get("cpu_time"),
+            entry.get("peak_rss_mb"),
+            entry.get("phases"),
+            entry.get("metric"),
+        )
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = {
+                "success": result.success,
+                "duration": round(result.duration, 1),
+                "output": result.output,
+                "cpu_time": result.cpu_time,
+                "peak_rss_mb": result.peak_rss_mb,
+                "phases": result.phases,
+                "metric": result.metric,
+                "time": time.time(),
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+
+
+class BuildTimeline:
+    """
+    One record per trial: the blocks that were commented out, whether the
+    build passed, wall and CPU time, peak RSS and phase durations. Written
+    after every trial, as CSV if `path` ends in .csv and as JSON otherwise.
+    """
+
+    FIELDS = [
+        "time",
+        "config",
+        "commented_out",
+        "success",
+        "cached",
+        "wall",
+        "cpu",
+        "peak_rss_mb",
+        "metric",
+    ]
+
+    def __init__(self, path=TIMELINE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = []
+
+    def record(self, text, commented_out, result, cached):
+        entry = {
+            "time": round(time.time(), 1),
+            "config": hashlib.sha256(text.encode("utf-8")).hexdigest()[:12],
+            "commented_out": (
+                sorted(commented_out) if commented_out is not None else None
+            ),
+            "success": result.success,
+            "cached": cached,
+            "wall": round(result.duration, 1),
+            "cpu": result.cpu_time,
+            "peak_rss_mb": result.peak_rss_mb,
+            "metric": result.metric,
+            "phases": result.phases or {},
+        }
+        with self.lock:
+            self.records.append(entry)
+            self._write()
+
+    def _write(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            if self.path.endswith(".csv"):
+                writer = csv.writer(f)
+                writer.writerow(self.FIELDS + PHASE_NAMES)
+                for entry in self.records:
+                    row = [entry[field] for field in self.FIELDS]
+                    if entry["commented_out"] is not None:
+                        row[2] = " ".join(map(str, entry["commented_out"]))
+                    row += [entry["phases"].get(name) for name in PHASE_NAMES]
+                    writer.writerow(row)
+            else:
+                json.dump(self.records, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def slow_blocks(self, block_count, top=5):
+        """
+        A rough cost for each block: the mean compile time of the trials
+        that built it minus that of the trials that had it commented out.
+        Only trials that got through compilation count, each config once;
+        builds that never printed the compile marker have no compile time and
+        are skipped too.
+        Returns up to `top` (block index, seconds) pairs, slowest first.
+        """
+        samples = {}
+        for entry in self.records:
+            phases = entry["phases"]
+            if (
+                entry["commented_out"] is None
+                or "after compile" not in phases
+                or "compile" not in phases
+            ):
+                continue
+            samples[entry["config"]] = (
+                set(entry["commented_out"]),
+                phases["compile"],
+            )
+        costs = []
+        for i in range(block_count):
+            built = [t for out, t in samples.values() if i not in out]
+            skipped = [t for out, t in samples.values() if i in out]
+            if built and skipped:
+                cost = statistics.mean(built) - statistics.mean(skipped)
+                if cost > 0:
+                    costs.append((i, cost))
+        costs.sort(key=lambda pair: pair[1], reverse=True)
+        return costs[:top]
+
+
+def directory_size(path, skip=()):
+    """
+    Total size in bytes of the files under `path`, leaving out the top-level
+    entries named in `skip`.
+    """
+    total = 0
+    for root, dirs, files in os.walk(path):
+        if root == path:
+            dirs[:] = [d for d in dirs if d not in skip]
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def parse_threshold(text, metric):
+    """
+    A --threshold value: seconds for the time metrics, bytes for the size
+    metrics (with an optional K, M or G suffix, e.g. "850K").
+    """
+    if metric in TIME_METRICS:
+        return float(text.rstrip("sS"))
+    match = re.fullmatch(r"\s*([\d.]+)\s*([kKmMgG]?)[bB]?\s*", text)
+    if not match:
+        raise ValueError(f"Not a size: {text!r}")
+    return float(match.group(1)) * SIZE_SUFFIXES[match.group(2).lower()]
+
+
+def format_metric(value, metric):
+    if metric in TIME_METRICS:
+        return f"{value:.1f}s"
+    for suffix in ("G", "M", "K"):
+        if value >= SIZE_SUFFIXES[suffix.lower()]:
+            return f"{value / SIZE_SUFFIXES[suffix.lower()]:.1f} {suffix}B"
+    return f"{value:.0f} B"
+
+
+class MetricCheck:
+    """
+    Turns builds into pass/fail for --metric: a variant passes if its build
+    time, compile time, .next size (without .next/cache) or size of the
+    chunks matching `chunk` (a regex on paths under .next/static/chunks)
+    stays at or under `threshold`. A build that fails does not pass.
+
+    Times are noisy, so each variant is built `repeats` times and judged by
+    the median, or with stat="ci" by the mean once its 95% confidence
+    interval lies entirely on one side of the threshold (building again, up
+    to `max_repeats` times, while it straddles it). Sizes are measured once.
+    """
+
+    def __init__(
+        self,
+        metric,
+        threshold,
+        repeats=3,
+        stat="median",
+        max_repeats=None,
+        chunk=None,
+    ):
+        self.metric = metric
+        self.threshold = threshold
+        self.stat = stat
+        self.chunk = re.compile(chunk) if chunk else None
+        if metric in TIME_METRICS:
+            self.repeats = max(repeats, 1)
+            self.max_repeats = max(max_repeats or 3 * repeats, self.repeats)
+        else:
+            self.repeats = self.max_repeats = 1
+        # Part of the cache key, since the verdict depends on all of these.
+        parts = (metric, threshold, self.repeats, stat, self.max_repeats, chunk)
+        self.key = "\0".join(map(str, parts))
+
+    def measure(self, result, next_dir):
+        if self.metric == "build-time":
+            return result.duration
+        if self.metric == "compile-time":
+            return (result.phases or {}).get("compile", result.duration)
+        if self.metric == "output-size":
+            return directory_size(next_dir, skip=("cache",))
+        chunks = os.path.join(next_dir, "static", "chunks")
+        total = 0
+        for root, _, files in os.walk(chunks):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, chunks).replace(os.sep, "/")
+                if self.chunk is None or self.chunk.search(relative):
+                    total += os.path.getsize(path)
+        return total
+
+    def summarize(self, samples):
+        """
+        (value, decided) for the samples so far: the statistic compared with
+        the threshold, and whether no more builds are needed.
+        """
+        n = len(samples)
+        if self.stat == "median" or n < 2:
+            return statistics.median(samples), n >= self.repeats
+        mean = statistics.mean(samples)
+        df = n - 1
+        t = T_95[max(d for d in T_95 if d <= df)]
+        half_width = t * statistics.stdev(samples) / math.sqrt(n)
+        clear = (
+            mean - half_width > self.threshold
+            or mean + half_width <= self.threshold
+        )
+        decided = n >= self.max_repeats or (n >= self.repeats and clear)
+        return mean, decided
+
+    def describe(self, value):
+        return format_metric(value, self.metric)
+
+
+class TrialRunner:
+    """
+    Builds config variants: in place one at a time, or in the worktrees of
+    `pool` several at once. Results come from `cache` when the same config
+    text was built before. Unless `warm_next_cache` is set, .next is removed
+    before every build so that no trial depends on an earlier one.
+    `failure_pattern` and `pass_pattern` are passed on to run_build. With a
+    `metric` (a MetricCheck), a trial passes when the metric stays under its
+    threshold rather than when the build succeeds. Every trial, cached or
+    not, is recorded in `timeline`. With `overlay`, in-place trials are
+    written to OVERLAY_NAME and built into OVERLAY_DIST_DIR instead of
+    replacing the config and .next.
+    """
+
+    def __init__(
+        self,
+        cache=None,
+        pool=None,
+        warm_next_cache=False,
+        failure_pattern=None,
+        pass_pattern=None,
+        timeline=None,
+        metric=None,
+        overlay=False,
+    ):
+        self.cache = cache
+        self.overlay = overlay
+        self.dist_dir = OVERLAY_DIST_DIR if overlay else ".next"
+        self.timeline = timeline
+        self.metric = metric
+        self.pool = pool
+        self.warm_next_cache = warm_next_cache
+        self.failure_pattern = failure_pattern
+        self.pass_pattern = pass_pattern
+        # The outcome of a trial depends on the patterns, so they are part of
+        # the cache key.
+        self.predicate_key = "\0".join(
+            p.pattern if p is not None else ""
+            for p in (failure_pattern, pass_pattern)
+        )
+        if metric is not None:
+            self.predicate_key += "\0" + metric.key
+
+    def _key(self, text):
+        if self.cache is None:
+            return text
+        return self.cache.key(text, self.predicate_key)
+
+    @property
+    def jobs(self):
+        return self.pool.size if self.pool is not None else 1
+
+    def run(self, modified_lines):
+        return self.run_many([modified_lines])[0]
+
+    def run_many(self, variants, commented_out=None):
+        """
+        Build every variant (a list of config lines). `commented_out`, if
+        given, holds the indices of the blocks commented out in each one,
+        for the timeline.
+        Returns a list of success flags in the order of `variants`.
+        """
+        return [
+            result.success
+            for result in self.results(variants, commented_out)
+        ]
+
+    def results(self, variants, commented_out=None):
+        """
+        Like run_many, but returns the BuildResult of every variant.
+        """
+        texts = ["".join(lines) for lines in variants]
+        if commented_out is None:
+            commented_out = [None] * len(texts)
+        results = {}
+        pending = []
+        seen = set()
+        for text, blocks in zip(texts, commented_out):
+            key = self._key(text)
+            if key in seen:
+                continue
+            seen.add(key)
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                outcome = "succeeded" if cached.success else "failed"
+                if self.metric is not None and cached.metric is not None:
+                    outcome += f", {self.metric.describe(cached.metric)}"
+                print(
+                    f"Cached: build {outcome} ({cached.duration:.0f}s), "
+                    "not rebuilding."
+                )
+                results[key] = cached
+                if self.timeline is not None:
+                    self.timeline.record(text, blocks, cached, cached=True)
+            else:
+                pending.append((key, text, blocks))
+
+        if self.pool is None:
+            for key, text, blocks in pending:
+                results[key] = self._build(key, text, blocks, None)
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.pool.size)
+            try:
+                futures = [
+                    (
+                        key,
+                        executor.submit(
+                            self._build_in_worktree, key, text, blocks
+                        ),
+                    )
+                    for key, text, blocks in pending
+                ]
+                for key, future in futures:
+                    results[key] = future.result()
+            except BaseException:
+                # The builds run in their own sessions, so Ctrl+C / SIGTERM
+                # never reaches them; kill them before giving up on the
+                # workers instead of waiting for every build to finish.
+                stop_active_builds()
+                executor.shutdown(wait=False, cancel_futures=True)
+                # A worker may have started a queued build in between.
+                stop_active_builds()
+                raise
+            executor.shutdown()
+
+        return [results[self._key(text)] for text in texts]
+
+    def _build_in_worktree(self, key, text, blocks):
+        with self.pool.checkout() as path:
+            return self._build(key, text, blocks, path)
+
+    def _build(self, key, text, blocks, cwd):
+        directory = cwd or APP_DIR
+        env = None
+        if self.overlay:
+            overlay_path = os.path.join(directory, OVERLAY_NAME)
+            write_text_atomic(overlay_path, text + OVERLAY_FOOTER)
+            env = {
+                OVERLAY_ENV: overlay_path,
+                "NEXT_BISECT_DIST_DIR": OVERLAY_DIST_DIR,
+            }
+        else:
+            write_text_atomic(os.path.join(directory, CONFIG_NAME), text)
+        if self.metric is None:
+            result = self._run_build(directory, cwd, env)
+        else:
+            result = self._measure(directory, cwd, env)
+        if self.cache is not None:
+            self.cache.put(key, result)
+        if self.timeline is not None:
+            self.timeline.record(text, blocks, result, cached=False)
+        return result
+
+    def _run_build(self, directory, cwd, env):
+        if not self.warm_next_cache:
+            shutil.rmtree(
+                os.path.join(directory, self.dist_dir), ignore_errors=True
+            )
+        return run_build(cwd, self.failure_pattern, self.pass_pattern, env)
+
+    def _measure(self, directory, cwd, env):
+        """
+        Build until the metric's statistic is decided. Returns the last
+        build's result, with `metric` set to the statistic and `success` to
+        whether it is within the threshold.
+        """
+        samples = []
+        while True:
+            result = self._run_build(directory, cwd, env)
+            if not result.success:
+                print("The build failed, so the variant does not pass.")
+                return result
+            next_dir = os.path.join(directory, self.dist_dir)
+            samples.append(self.metric.measure(result, next_dir))
+            value, decided = self.metric.summarize(samples)
+            if decided:
+                break
+        passed = value <= self.metric.threshold
+        print(
+            f"{self.metric.metric}: {self.metric.describe(value)} over "
+            f"{len(samples)} build(s), "
+            f"{'within' if passed else 'over'} the threshold of "
+            f"{self.metric.describe(self.metric.threshold)}."
+        )
+        return result._replace(success=passed, metric=value)
 
 
 def restore_backup():
@@ -74,13 +893,138 @@ def restore_backup():
         print("Restored original config from backup.")
 
 
-def detect_blocks(lines):
+def link_directory(source, link):
+    """
+    Make `link` point at the directory `source`: a symlink, or a junction on
+    Windows where symlinks need extra privileges.
+    """
+    try:
+        os.symlink(source, link, target_is_directory=True)
+    except OSError:
+        if sys.platform != "win32":
+            raise
+        subprocess.run(
+            ["cmd", "/c", "mklink", "/J", link, source],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+
+def _remove_readonly(func, path, _):
+    # Windows refuses to delete read-only files; clear the flag and retry.
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+def remove_worktree(path):
+    """
+    Delete a worktree without following its links into the shared
+    directories.
+    """
+    for name in SHARED_DIRS:
+        link = os.path.join(path, name)
+        if os.path.islink(link):
+            os.unlink(link)
+        elif os.path.isdir(link) and sys.platform == "win32":
+            os.rmdir(link)  # a junction; rmdir removes only the link
+    shutil.rmtree(path, onerror=_remove_readonly)
+
+
+class WorktreePool:
+    """
+    A fixed number of copies of the app directory, used to run several builds
+    at once without touching the working tree. node_modules is linked rather
+    than copied. Worktrees are removed on exit, and stale ones left behind by
+    an interrupted run are removed on start.
+    """
+
+    def __init__(
+        self, size, app_dir=APP_DIR, seed_next_cache=False, dist_dir=".next"
+    ):
+        self.size = size
+        self.seed_next_cache = seed_next_cache
+        self.dist_dir = dist_dir
+        self.app_dir = app_dir
+        self.parent = os.path.dirname(app_dir)
+        self.paths = []
+        self.free = queue.Queue()
+        self.closed = False
+
+    def __enter__(self):
+        atexit.register(self.close)
+        for name in os.listdir(self.parent):
+            if name.startswith(WORKTREE_PREFIX):
+                print(f"Removing stale worktree {name}")
+                remove_worktree(os.path.join(self.parent, name))
+        for i in range(self.size):
+            path = os.path.join(self.parent, f"{WORKTREE_PREFIX}{i}")
+            print(f"Creating worktree {path}")
+            self.paths.append(path)
+            shutil.copytree(
+                self.app_dir,
+                path,
+                symlinks=True,
+                ignore=shutil.ignore_patterns(*WORKTREE_IGNORE),
+            )
+            for name in SHARED_DIRS:
+                source = os.path.join(self.app_dir, name)
+                if os.path.isdir(source):
+                    link_directory(source, os.path.join(path, name))
+            next_cache = os.path.join(self.app_dir, ".next", "cache")
+            if self.seed_next_cache and os.path.isdir(next_cache):
+                shutil.copytree(
+                    next_cache, os.path.join(path, self.dist_dir, "cache")
+                )
+            self.free.put(path)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextlib.contextmanager
+    def checkout(self):
+        path = self.free.get()
+        try:
+            yield path
+        finally:
+            self.free.put(path)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        stop_active_builds()
+        for path in self.paths:
+            if os.path.exists(path):
+                try:
+                    remove_worktree(path)
+                except OSError as e:
+                    print(f"Could not remove worktree {path}: {e}")
+
+
+def detect_blocks(lines, granularity="statement"):
+    """
+    Detect blocks in the config file: the statements of the webpack callback
+    (see config_blocks), or with granularity="fine" also their individual
+    alias keys, rules entries and transpilePackages elements.
+    Falls back to detect_pattern_blocks if the config cannot be parsed.
+    Returns a list of Block(start, end, label) tuples.
+    """
+    try:
+        return config_blocks.detect_blocks("".join(lines), granularity)
+    except config_blocks.ParseError as e:
+        print(f"Could not parse {CONFIG_NAME} ({e}); matching BLOCK_PATTERNS.")
+        return detect_pattern_blocks(lines)
+
+
+def detect_pattern_blocks(lines):
     """
     Detect blocks in the config file.
     A block starts when a line matches one of our BLOCK_PATTERNS.
     Then, we count curly braces to ensure we capture the entire block.
     We consider the block ended when the brace count is zero and the current line ends with a semicolon.
-    Returns a list of (start, end) tuples (inclusive start, exclusive end).
+    Returns a list of Block(start, end, label) tuples (inclusive start,
+    exclusive end).
     """
     blocks = []
     in_block = False
@@ -101,40 +1045,173 @@ def detect_blocks(lines):
             brace_count += line.count("{") - line.count("}")
             # If we've balanced all braces and the line ends with a semicolon, end the block.
             if brace_count <= 0 and line.strip().endswith(";"):
-                blocks.append((block_start, i + 1))
+                blocks.append(
+                    Block(block_start, i + 1, lines[block_start].strip())
+                )
                 in_block = False
                 block_start = None
                 brace_count = 0
     if in_block and block_start is not None:
-        blocks.append((block_start, len(lines)))
+        blocks.append(
+            Block(block_start, len(lines), lines[block_start].strip())
+        )
     return blocks
 
 
 def comment_out_blocks(lines, blocks_to_comment):
     """
-    Returns a new copy of lines with the specified blocks (list of (start, end) tuples) commented out.
+    Returns a new copy of lines with the specified blocks (list of Block tuples) commented out.
     """
     new_lines = lines.copy()
-    for start, end in blocks_to_comment:
+    for start, end, _ in blocks_to_comment:
         for i in range(start, end):
             if not new_lines[i].lstrip().startswith("//"):
                 new_lines[i] = "// " + new_lines[i]
     return new_lines
 
 
-def test_blocks(lines, block_list, selected_indices):
+def test_blocks(lines, block_list, selected_indices, runner):
     """
     Given a list of blocks and a set of indices to comment out,
     modify the lines accordingly and run the build.
     Returns True if the build succeeds, False otherwise.
     """
-    blocks_to_comment = [block_list[i] for i in sorted(selected_indices)]
-    modified_lines = comment_out_blocks(lines, blocks_to_comment)
-    write_config(modified_lines)
-    return run_build()
+    return test_subsets(runner, lines, block_list, [selected_indices])[0]
+
+
+def test_subsets(runner, lines, block_list, subsets):
+    """
+    Test several subsets at once (one worktree each when the runner has them).
+    Returns a list of build results in the order of `subsets`.
+    """
+    variants = [
+        comment_out_blocks(lines, [block_list[i] for i in sorted(subset)])
+        for subset in subsets
+    ]
+    return runner.run_many(variants, subsets)
+
+
+def split_indices(indices, parts):
+    """
+    Split `indices` into `parts` contiguous chunks of nearly equal size.
+    """
+    size, extra = divmod(len(indices), parts)
+    chunks = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(indices[start:end])
+        start = end
+    return chunks
+
+
+def parallel_bisect_blocks(lines, block_list, indices, runner):
+    """
+    k-ary version of bisect_blocks: the indices are split into as many chunks
+    as there are worktrees (at least two), every chunk is tested commented out
+    at the same time, and the search continues in the first chunk whose
+    removal makes the build succeed.
+    Returns a list of block indices that are problematic.
+    """
+    if not indices:
+        return []
+    if len(indices) == 1:
+        idx = indices[0]
+        print(
+            f"Testing single block {idx} (lines {block_list[idx][0]} to {block_list[idx][1]})..."
+        )
+        if test_blocks(lines, block_list, {idx}, runner):
+            print(f"Working config found by commenting out block {idx}!")
+            return [idx]
+        return []
+
+    chunks = split_indices(indices, min(len(indices), max(2, runner.jobs)))
+    print(f"Testing {len(chunks)} chunks commented out in parallel: {chunks}")
+    results = test_subsets(
+        runner, lines, block_list, [set(chunk) for chunk in chunks]
+    )
+    for chunk, success in zip(chunks, results):
+        if success:
+            if len(chunk) == 1:
+                print(
+                    f"Working config found by commenting out block {chunk[0]}!"
+                )
+                return chunk
+            return parallel_bisect_blocks(lines, block_list, chunk, runner)
+    print(
+        "Working configuration found by commenting out the entire set of selected blocks!"
+    )
+    return indices
+
+
+def ddmin_blocks(lines, block_list, indices, runner):
+    """
+    Delta debugging (ddmin): find a 1-minimal set of blocks that still makes
+    the build fail when every other block is commented out, i.e. removing any
+    single block from the result makes it pass. Unlike bisect_blocks this
+    also finds failures that need several blocks together.
+    Subsets of one round are built at once when the runner has worktrees.
+    Returns the list of block indices in that set.
+    """
+    all_indices = set(range(len(block_list)))
+
+    def still_failing(kept_sets):
+        subsets = [all_indices - set(kept) for kept in kept_sets]
+        return [
+            not ok for ok in test_subsets(runner, lines, block_list, subsets)
+        ]
+
+    print("Checking that the build fails with every block enabled...")
+    if not still_failing([indices])[0]:
+        print("The build succeeds with every block enabled; nothing to find.")
+        return []
+    print("Checking that the build succeeds with every block commented out...")
+    if still_failing([[]])[0]:
+        print("The build fails even with every block commented out.")
+        return []
+
+    current = list(indices)
+    n = 2
+    while len(current) >= 2:
+        chunks = split_indices(current, n)
+        complements = []
+        if n > 2:
+            # For n == 2 the complements are the chunks themselves.
+            complements = [
+                [i for i in current if i not in set(chunk)] for chunk in chunks
+            ]
+        print(f"ddmin: {len(current)} blocks left, testing {n} subsets...")
+        if runner.jobs > 1:
+            results = still_failing(chunks + complements)
+            chunk_results = results[: len(chunks)]
+            complement_results = results[len(chunks) :]
+        else:
+            chunk_results = still_failing(chunks)
+            complement_results = (
+                still_failing(complements)
+                if complements and not any(chunk_results)
+                else []
+            )
 
+        failing_chunk = next(
+            (c for c, f in zip(chunks, chunk_results) if f), None
+        )
+        if failing_chunk is not None:
+            current, n = failing_chunk, 2
+            continue
+        failing_complement = next(
+            (c for c, f in zip(complements, complement_results) if f), None
+        )
+        if failing_complement is not None:
+            current, n = failing_complement, max(n - 1, 2)
+            continue
+        if n >= len(current):
+            break
+        n = min(2 * n, len(current))
+    return current
 
-def bisect_blocks(lines, block_list, indices):
+
+def bisect_blocks(lines, block_list, indices, runner):
     """
     Recursively use binary search on the list of block indices to determine which block(s)
     when commented out cause the build to succeed.
@@ -148,7 +1225,7 @@ def bisect_blocks(lines, block_list, indices):
         print(
             f"Testing single block {idx} (lines {block_list[idx][0]} to {block_list[idx][1]})..."
         )
-        if test_blocks(lines, block_list, {idx}):
+        if test_blocks(lines, block_list, {idx}, runner):
             print(f"Working config found by commenting out block {idx}!")
             return [idx]
         else:
@@ -159,13 +1236,13 @@ def bisect_blocks(lines, block_list, indices):
     second_half = indices[mid:]
 
     print(f"Testing first half blocks {first_half} commented out...")
-    if test_blocks(lines, block_list, set(first_half)):
+    if test_blocks(lines, block_list, set(first_half), runner):
         # If build succeeds, the problematic code is in the first half.
-        return bisect_blocks(lines, block_list, first_half)
+        return bisect_blocks(lines, block_list, first_half, runner)
     else:
         print(f"Testing second half blocks {second_half} commented out...")
-        if test_blocks(lines, block_list, set(second_half)):
-            return bisect_blocks(lines, block_list, second_half)
+        if test_blocks(lines, block_list, set(second_half), runner):
+            return bisect_blocks(lines, block_list, second_half, runner)
         else:
             # If neither half individually fixes the build, then commenting out all of these blocks works.
             print(
@@ -174,31 +1251,307 @@ def bisect_blocks(lines, block_list, indices):
             return indices
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Find the webpack block in the Next.js config that breaks "
+        "the build (or, with --metric, makes it slower or bigger) by "
+        "commenting blocks out and rebuilding."
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of builds to run at once, each in its own copy of the "
+        "app next to it (default 1: build in place, one at a time). Not "
+        "allowed with the time metrics, whose builds must not compete for "
+        "CPU and disk.",
+    )
+    parser.add_argument(
+        "--search",
+        choices=["bisect", "ddmin"],
+        default="bisect",
+        help="'bisect' (default): find the block whose removal fixes the "
+        "build. 'ddmin': find a minimal set of blocks that together break it.",
+    )
+    parser.add_argument(
+        "--granularity",
+        choices=config_blocks.GRANULARITIES,
+        default="statement",
+        help="'statement' (default): search the statements of the webpack "
+        "callback. 'fine': also split them into individual alias keys, rules "
+        "entries and nested statements, and search transpilePackages "
+        "elements.",
+    )
+    parser.add_argument(
+        "--metric",
+        choices=METRICS,
+        help="Search for a performance regression instead of a failure: a "
+        "trial is bad when this metric exceeds --threshold. 'build-time' and "
+        "'compile-time' are in seconds, 'output-size' (.next without its "
+        "cache) and 'chunk-size' (see --chunk) in bytes.",
+    )
+    parser.add_argument(
+        "--threshold",
+        help="The largest good value of --metric: seconds, or a size such as "
+        "'850K' or '12M'.",
+    )
+    parser.add_argument(
+        "--chunk",
+        help="With --metric chunk-size, a regex selecting the files under "
+        ".next/static/chunks to add up (default: all of them).",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Builds per variant for the time metrics (default 3).",
+    )
+    parser.add_argument(
+        "--stat",
+        choices=["median", "ci"],
+        default="median",
+        help="How repeated build times are judged: 'median' (default), or "
+        "'ci' to keep building (up to --max-repeats) until the 95%% "
+        "confidence interval of the mean is clear of the threshold.",
+    )
+    parser.add_argument(
+        "--max-repeats",
+        type=int,
+        help="Most builds per variant with --stat ci (default 3 * --repeat).",
+    )
+    parser.add_argument(
+        "--failure-pattern",
+        help="Regex identifying the failure being searched for. A trial only "
+        "counts as failing if it shows up in the build output, and the build "
+        "is stopped as soon as it does.",
+    )
+    parser.add_argument(
+        "--pass-pattern",
+        help="Regex for output that only appears after the point where the "
+        "failure used to happen (e.g. 'Compiled successfully'); the build is "
+        "stopped there and the trial counts as passing.",
+    )
+    parser.add_argument(
+        "--overlay",
+        action="store_true",
+        help=f"Never touch {CONFIG_NAME}: build each variant from a generated "
+        f"{OVERLAY_NAME} (picked up through {OVERLAY_ENV}) into "
+        f"{OVERLAY_DIST_DIR}, so trials can run next to a dev server.",
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help=f"Replace {CONFIG_NAME} with the working configuration found "
+        f"(the original stays in {os.path.basename(BACKUP_PATH)}). By default "
+        f"it is written to {os.path.basename(RESULT_PATH)} and {CONFIG_NAME} "
+        "is left as it was.",
+    )
+    parser.add_argument(
+        "--restore",
+        action="store_true",
+        help=f"Put back {CONFIG_NAME} from {os.path.basename(BACKUP_PATH)} "
+        "and exit.",
+    )
+    parser.add_argument(
+        "--cache-file",
+        default=BUILD_CACHE_PATH,
+        help="Where build results are remembered across runs.",
+    )
+    parser.add_argument(
+        "--timeline",
+        default=TIMELINE_PATH,
+        help="Where this run's build timings are written, one record per "
+        "trial (CSV if the name ends in .csv, JSON otherwise).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always rebuild, ignoring and not recording cached results.",
+    )
+    parser.add_argument(
+        "--warm-next-cache",
+        action="store_true",
+        help="Keep .next/cache between attempts (and seed worktrees with the "
+        "app's) so builds are incremental. By default every attempt starts "
+        "without .next.",
+    )
+    args = parser.parse_args()
+    if args.metric:
+        if args.threshold is None:
+            parser.error("--metric needs a --threshold")
+        if args.failure_pattern or args.pass_pattern:
+            parser.error(
+                "--metric measures complete builds; it cannot be combined "
+                "with --failure-pattern or --pass-pattern"
+            )
+        if args.metric in TIME_METRICS and args.jobs > 1:
+            # Concurrent builds slow each other down, so variants would be
+            # timed under more contention than the baseline (and the cache
+            # would keep the inflated times).
+            parser.error(
+                f"--metric {args.metric} times builds one at a time; it "
+                "cannot be combined with --jobs"
+            )
+        try:
+            args.threshold = parse_threshold(args.threshold, args.metric)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+
+def check_overlay_hook():
+    """
+    The reason --overlay cannot be used with this config, or None.
+    """
+    if not CONFIG_NAME.endswith(".js"):
+        return f"--overlay needs a CommonJS next.config.js, not {CONFIG_NAME}"
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        if OVERLAY_ENV not in f.read():
+            return (
+                f"--overlay needs {CONFIG_NAME} to end by handing its exports "
+                f"over to the file named by process.env.{OVERLAY_ENV} (see "
+                "apps/web/next.config.js)."
+            )
+    return None
+
+
 def main():
+    args = parse_args()
+    if args.restore:
+        restore_backup()
+        return
+    if args.overlay:
+        problem = check_overlay_hook()
+        if problem:
+            print(problem)
+            sys.exit(2)
+    # Unwind (stopping builds and restoring the config) on kill as on Ctrl+C.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(128 + signal.SIGTERM))
+    recover_interrupted_run()
+
     # Create a backup of the original config if not already created.
-    if not os.path.exists(BACKUP_PATH):
+    if (not args.overlay or args.apply) and not os.path.exists(BACKUP_PATH):
         shutil.copy(CONFIG_PATH, BACKUP_PATH)
         print(f"Backup created at {BACKUP_PATH}")
 
     lines = read_config()
-    block_list = detect_blocks(lines)
-    print("Detected blocks (line ranges):", block_list)
+    block_list = detect_blocks(lines, args.granularity)
+    print("Detected blocks (line ranges):")
+    for i, block in enumerate(block_list):
+        print(f"  {i}: lines {block.start} to {block.end}: {block.label}")
 
     if not block_list:
-        print("No blocks detected with the given patterns. Exiting.")
+        print("No blocks detected in the webpack config. Exiting.")
         return
 
     indices = list(range(len(block_list)))
-    problematic_blocks = bisect_blocks(lines, block_list, indices)
+    cache = None if args.no_cache else BuildCache(args.cache_file)
+    failure_pattern = (
+        re.compile(args.failure_pattern) if args.failure_pattern else None
+    )
+    pass_pattern = re.compile(args.pass_pattern) if args.pass_pattern else None
+    timeline = BuildTimeline(args.timeline)
+    metric = None
+    if args.metric:
+        metric = MetricCheck(
+            args.metric,
+            args.threshold,
+            args.repeat,
+            args.stat,
+            args.max_repeats,
+            args.chunk,
+        )
+    with contextlib.ExitStack() as stack:
+        pool = None
+        if args.jobs > 1:
+            pool = stack.enter_context(
+                WorktreePool(
+                    args.jobs,
+                    seed_next_cache=args.warm_next_cache,
+                    dist_dir=OVERLAY_DIST_DIR if args.overlay else ".next",
+                )
+            )
+        elif not args.overlay:
+            # Trials replace the config in place; put it back however the
+            # search ends.
+            stack.enter_context(restored_config())
+        runner = TrialRunner(
+            cache,
+            pool,
+            args.warm_next_cache,
+            failure_pattern,
+            pass_pattern,
+            timeline,
+            metric,
+            args.overlay,
+        )
+        if metric is not None and args.search != "ddmin":
+            print(f"Measuring {args.metric} of the original config...")
+            baseline = runner.results([lines])[0]
+            if baseline.success:
+                print("The original config is within the threshold. Exiting.")
+                return
+        if args.search == "ddmin":
+            problematic_blocks = ddmin_blocks(
+                lines, block_list, indices, runner
+            )
+        elif pool is not None:
+            problematic_blocks = parallel_bisect_blocks(
+                lines, block_list, indices, runner
+            )
+        else:
+            problematic_blocks = bisect_blocks(
+                lines, block_list, indices, runner
+            )
 
     print("Identified problematic block indices:", problematic_blocks)
     for i in problematic_blocks:
         print(
             f"Block {i} (lines {block_list[i][0]} to {block_list[i][1]}) is likely causing the issue."
         )
+        print(f"    {block_list[i].label}")
 
+    slow_blocks = timeline.slow_blocks(len(block_list))
+    if slow_blocks:
+        print(
+            "Blocks that appear to slow down compilation "
+            "(mean compile time with minus without):"
+        )
+        for i, cost in slow_blocks:
+            print(f"  Block {i}: +{cost:.1f}s  {block_list[i].label}")
+    if timeline.records:
+        print(f"Build timings written to {timeline.path}")
+
+    overlay_path = os.path.join(APP_DIR, OVERLAY_NAME)
+    if args.search == "ddmin":
+        # The result is the set that breaks the build, not a fix; the
+        # original config has been restored.
+        if args.overlay and os.path.exists(overlay_path):
+            os.remove(overlay_path)
+        print(
+            "These blocks together reproduce the failure. The original config has been left in place."
+        )
+        return
+
+    working_lines = comment_out_blocks(
+        lines, [block_list[i] for i in problematic_blocks]
+    )
+    if args.overlay and os.path.exists(overlay_path):
+        os.remove(overlay_path)
+    if args.apply:
+        write_config(working_lines)
+        print(
+            f"A working configuration has been written to {CONFIG_NAME} (the "
+            f"original is in {os.path.basename(BACKUP_PATH)}). Please review "
+            "the changes in your config file."
+        )
+        return
+    write_config(working_lines, RESULT_PATH)
     print(
-        "A working configuration has been left in place. Please review the changes in your config file."
+        f"The working configuration was written to "
+        f"{os.path.basename(RESULT_PATH)}; {CONFIG_NAME} has not been changed "
+        "(rerun with --apply to replace it)."
     )
 
 
@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+"""
+config_blocks.py
+
+Block detection for next.config.{ts,mjs,js}, used by
+bisect_next_config_build.py.
+
+  - tokenize: a small JavaScript/TypeScript tokenizer that understands
+    strings, template literals (including nested ${...} expressions),
+    comments and regex literals, so braces inside any of them are not
+    mistaken for code.
+  - detect_blocks: finds the webpack callback, splits its body into
+    statements and returns the ones that can be commented out line by line
+    without leaving invalid code behind. With granularity="fine", statements
+    are split further: the bodies of if/for blocks and callbacks, the entries
+    of rules/plugins/alias/fallback/extensions assignments and push() calls,
+    and the elements of transpilePackages.
+
+Only whole lines can be commented out, so a statement or element is only a
+block if nothing else shares its first or last line. Variable declarations
+are never blocks: commenting one out would leave the statements that use it
+referring to a name that no longer exists. Neither is the callback's
+"return config", without which no build can pass.
+
+Usage:
+    python config_blocks.py [next.config.js] [--granularity fine]
+"""
+
+import argparse
+import re
+from collections import namedtuple
+
+Token = namedtuple("Token", ["kind", "value", "line", "end_line"])
+
+# A line range (inclusive start, exclusive end) and a short description.
+Block = namedtuple("Block", ["start", "end", "label"])
+
+GRANULARITIES = ["statement", "fine"]
+
+_IDENT = re.compile(r"[A-Za-z0-9_$]+")
+_PUNCTUATORS = ("...", "=>", "?.")
+_OPENERS = {"(": ")", "[": "]", "{": "}"}
+
+# After one of these a "/" starts a regex literal rather than a division.
+_REGEX_KEYWORDS = {
+    "return",
+    "typeof",
+    "instanceof",
+    "in",
+    "of",
+    "new",
+    "delete",
+    "void",
+    "throw",
+    "case",
+    "do",
+    "else",
+    "yield",
+    "await",
+}
+# Statements whose body is a block and that end with it (no semicolon).
+_BLOCK_STATEMENTS = {
+    "if",
+    "for",
+    "while",
+    "try",
+    "switch",
+    "function",
+    "class",
+    "async",
+}
+# Keywords that continue a statement after its closing brace.
+_CONTINUATIONS = {"else", "catch", "finally"}
+_DECLARATIONS = {"const", "let", "var"}
+# Statements that are never blocks: declarations, and the return without
+# which the callback gives webpack no config at all.
+_NEVER_BLOCKS = _DECLARATIONS | {"return"}
+# Keywords that continue an expression or statement on the next line.
+_NO_ASI_BEFORE = {"in", "of", "instanceof", "as"} | _CONTINUATIONS
+# Tokens that can end an expression, for automatic semicolon insertion.
+_EXPRESSION_ENDS = {"ident", "string", "template", "regex"}
+# Assignment targets and push()/unshift() receivers whose entries become
+# separate blocks at the fine granularity.
+FINE_TARGETS = re.compile(
+    r"(?:^|\.)(alias|fallback|rules|plugins|extensions|transpilePackages)$"
+)
+
+
+class ParseError(ValueError):
+    pass
+
+
+def _count_lines(source, start, end, line):
+    return line + source.count("\n", start, end)
+
+
+def tokenize(source):
+    """
+    Split JavaScript/TypeScript source into tokens, dropping whitespace and
+    comments. A template literal is a single token, however many
+    ${...} expressions (and nested templates) it contains.
+    """
+    tokens = []
+    _tokenize_code(source, 0, 0, tokens, stop_at_brace=False)
+    return tokens
+
+
+def _tokenize_code(source, pos, line, tokens, stop_at_brace):
+    """
+    Tokenize from `pos` until the end of the source or, with
+    `stop_at_brace`, until the "}" that closes a ${...} expression.
+    Returns (pos, line) after the last character consumed.
+    """
+    length = len(source)
+    depth = 0
+    while pos < length:
+        ch = source[pos]
+        if ch == "\n":
+            line += 1
+            pos += 1
+        elif ch.isspace():
+            pos += 1
+        elif source.startswith("//", pos):
+            end = source.find("\n", pos)
+            pos = length if end == -1 else end
+        elif source.startswith("/*", pos):
+            end = source.find("*/", pos + 2)
+            if end == -1:
+                raise ParseError(f"Unterminated comment on line {line + 1}")
+            line = _count_lines(source, pos, end, line)
+            pos = end + 2
+        elif ch in "'\"":
+            end = _scan_string(source, pos, ch, line)
+            tokens.append(Token("string", source[pos:end], line, line))
+            pos = end
+        elif ch == "`":
+            start_line = line
+            start = pos
+            pos, line = _scan_template(source, pos, line)
+            tokens.append(
+                Token("template", source[start:pos], start_line, line)
+            )
+        elif ch == "/" and _regex_allowed(tokens):
+            end = _scan_regex(source, pos, line)
+            tokens.append(Token("regex", source[pos:end], line, line))
+            pos = end
+        elif _IDENT.match(ch):
+            match = _IDENT.match(source, pos)
+            tokens.append(Token("ident", match.group(), line, line))
+            pos = match.end()
+        else:
+            if stop_at_brace:
+                if ch == "{":
+                    depth += 1
+                elif ch == "}":
+                    if depth == 0:
+                        return pos + 1, line
+                    depth -= 1
+            value = next(
+                (p for p in _PUNCTUATORS if source.startswith(p, pos)), ch
+            )
+            tokens.append(Token("punct", value, line, line))
+            pos += len(value)
+    if stop_at_brace:
+        raise ParseError("Unterminated template expression")
+    return pos, line
+
+
+def _scan_string(source, pos, quote, line):
+    i = pos + 1
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            i += 2
+        elif ch == quote:
+            return i + 1
+        elif ch == "\n":
+            break
+        else:
+            i += 1
+    raise ParseError(f"Unterminated string on line {line + 1}")
+
+
+def _scan_template(source, pos, line):
+    i = pos + 1
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            if source[i + 1 : i + 2] == "\n":
+                line += 1
+            i += 2
+        elif ch == "`":
+            return i + 1, line
+        elif source.startswith("${", i):
+            # The expression's tokens are not kept: the template is one token.
+            i, line = _tokenize_code(source, i + 2, line, [], True)
+        else:
+            if ch == "\n":
+                line += 1
+            i += 1
+    raise ParseError("Unterminated template literal")
+
+
+def _scan_regex(source, pos, line):
+    i = pos + 1
+    in_class = False
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "\n":
+            break
+        if ch == "[":
+            in_class = True
+        elif ch == "]":
+            in_class = False
+        elif ch == "/" and not in_class:
+            match = _IDENT.match(source, i + 1)
+            return match.end() if match else i + 1
+        i += 1
+    raise ParseError(f"Unterminated regex on line {line + 1}")
+
+
+def _regex_allowed(tokens):
+    if not tokens:
+        return True
+    prev = tokens[-1]
+    if prev.kind == "ident":
+        return prev.value in _REGEX_KEYWORDS
+    if prev.kind in ("string", "template", "regex"):
+        return False
+    return prev.value not in (")", "]", "}")
+
+
+def match_brackets(tokens):
+    """
+    Map the index of every opening bracket to the index of its closing one.
+    """
+    pairs = {}
+    stack = []
+    for i, token in enumerate(tokens):
+        if token.kind != "punct":
+            continue
+        if token.value in _OPENERS:
+            stack.append(i)
+        elif token.value in (")", "]", "}"):
+            if not stack or _OPENERS[tokens[stack[-1]].value] != token.value:
+                raise ParseError(
+                    f"Unbalanced {token.value!r} on line {token.line + 1}"
+                )
+            pairs[stack.pop()] = i
+    if stack:
+        opener = tokens[stack[-1]]
+        raise ParseError(
+            f"Unclosed {opener.value!r} on line {opener.line + 1}"
+        )
+    return pairs
+
+
+class _Parser:
+    def __init__(self, source):
+        self.lines = source.splitlines(keepends=True)
+        self.tokens = tokenize(source)
+        self.pairs = match_brackets(self.tokens)
+
+    def is_punct(self, i, value):
+        return (
+            0 <= i < len(self.tokens)
+            and self.tokens[i].kind == "punct"
+            and self.tokens[i].value == value
+        )
+
+    def is_ident(self, i, value=None):
+        return (
+            0 <= i < len(self.tokens)
+            and self.tokens[i].kind == "ident"
+            and (value is None or self.tokens[i].value == value)
+        )
+
+    # --- Statements -----------------------------------------------------
+
+    def statements(self, open_index):
+        """
+        (first, last) token indices of the statements directly inside the
+        block whose "{" is at `open_index`.
+        """
+        close = self.pairs[open_index]
+        result = []
+        i = open_index + 1
+        while i < close:
+            if self.is_punct(i, ";"):
+                i += 1
+                continue
+            last = self._statement_end(i, close)
+            result.append((i, last))
+            i = last + 1
+        return result
+
+    def _statement_end(self, first, limit):
+        block_statement = self.tokens[first].value in _BLOCK_STATEMENTS
+        i = first
+        while i < limit:
+            token = self.tokens[i]
+            if token.kind == "punct" and token.value in _OPENERS:
+                close = self.pairs[i]
+                if (
+                    token.value == "{"
+                    and (block_statement or i == first)
+                    and not self._continues(close + 1, limit)
+                    and self._is_body_brace(i)
+                ):
+                    return close
+                i = close
+            elif token.kind == "punct" and token.value == ";":
+                return i
+            if self._asi(i, limit):
+                return i
+            i += 1
+        return limit - 1
+
+    def _continues(self, i, limit):
+        if i >= limit:
+            return False
+        if self.tokens[i].value in _CONTINUATIONS:
+            return True
+        # e.g. "function () {}()" or "} while (...)" are rare enough in a
+        # config to ignore; an operator after a block continues it.
+        return self.is_punct(i, ".") or self.is_punct(i, "?.")
+
+    def _asi(self, i, limit):
+        """
+        Whether a semicolon would be inserted after token `i`: the next token
+        is on a later line, and neither side continues the expression.
+        """
+        if i + 1 >= limit:
+            return False
+        token, following = self.tokens[i], self.tokens[i + 1]
+        if following.line <= token.end_line:
+            return False
+        ends = token.kind in _EXPRESSION_ENDS or token.value in (")", "]", "}")
+        if not ends:
+            return False
+        if following.kind not in ("ident", "string"):
+            return False
+        return following.value not in _NO_ASI_BEFORE
+
+    def _is_body_brace(self, i):
+        """
+        Whether the "{" at `i` opens a statement or function body rather
+        than an object literal.
+        """
+        if i == 0:
+            return True
+        prev = self.tokens[i - 1]
+        if prev.kind == "ident":
+            return prev.value in ("else", "try", "finally", "do")
+        return prev.value in ("=>", ")", ";", "{", "}")
+
+    def bodies(self, first, last):
+        """
+        The "{" indices of statement and function bodies directly within the
+        token range (not within other bodies).
+        """
+        result = []
+        i = first
+        while i <= last:
+            token = self.tokens[i]
+            if token.kind == "punct" and token.value in _OPENERS:
+                if token.value == "{" and self._is_body_brace(i):
+                    result.append(i)
+                    i = self.pairs[i] + 1
+                    continue
+                # Look inside brackets for callbacks, e.g. forEach((x) => {}).
+                inner = self.bodies(i + 1, self.pairs[i] - 1)
+                result.extend(inner)
+                i = self.pairs[i] + 1
+                continue
+            i += 1
+        return result
+
+    # --- Elements -------------------------------------------------------
+
+    def elements(self, open_index):
+        """
+        (first, last) token indices of the comma-separated entries of the
+        array, object or argument list opened at `open_index`.
+        """
+        close = self.pairs[open_index]
+        result = []
+        i = open_index + 1
+        start = i
+        while i < close:
+            token = self.tokens[i]
+            if token.kind == "punct" and token.value in _OPENERS:
+                i = self.pairs[i] + 1
+                continue
+            if token.kind == "punct" and token.value == ",":
+                if i > start:
+                    result.append((start, i - 1))
+                start = i + 1
+            i += 1
+        if start < close:
+            result.append((start, close - 1))
+        return result
+
+    # --- Line ranges ----------------------------------------------------
+
+    def line_range(self, first, last):
+        """
+        The lines (start, end) spanned by tokens first..last if no other
+        token shares them, else None. A trailing "," or ";" belongs to the
+        range.
+        """
+        tokens = self.tokens
+        if first > 0 and tokens[first - 1].end_line >= tokens[first].line:
+            return None
+        end = last
+        if end + 1 < len(tokens) and tokens[end + 1].value in (",", ";"):
+            if tokens[end + 1].line == tokens[end].end_line:
+                end += 1
+        following = end + 1
+        if (
+            following < len(tokens)
+            and tokens[following].line <= tokens[end].end_line
+        ):
+            return None
+        return tokens[first].line, tokens[end].end_line + 1
+
+    def snippet(self, start):
+        text = self.lines[start].strip()
+        return text if len(text) <= 60 else text[:57] + "..."
+
+    # --- The config -----------------------------------------------------
+
+    def webpack_body(self):
+        """
+        The "{" index of the webpack callback's body, or None.
+        """
+        for i, token in enumerate(self.tokens):
+            if token.kind != "ident" or token.value != "webpack":
+                continue
+            if self.is_punct(i - 1, ".") or self.is_punct(i - 1, "?."):
+                continue
+            j = i + 1
+            if self.is_punct(j, ":"):
+                j += 1
+                if self.is_ident(j, "async"):
+                    j += 1
+                if self.is_ident(j, "function"):
+                    j += 1
+            elif not self.is_punct(j, "("):
+                continue
+            # Skip the parameters (and a return type) up to "=>" or "{".
+            has_params = False
+            while j < len(self.tokens):
+                if self.is_punct(j, "("):
+                    j = self.pairs[j] + 1
+                    has_params = True
+                elif self.is_punct(j, "=>"):
+                    j += 1
+                    break
+                elif self.is_punct(j, "{"):
+                    if not has_params:
+                        j = None  # an object, not a function
+                    break
+                elif self.is_punct(j, ",") or self.is_punct(j, "}"):
+                    j = None
+                    break
+                else:
+                    j += 1
+            if j is not None and self.is_punct(j, "{"):
+                return j
+        return None
+
+    def transpile_packages_array(self):
+        """
+        The "[" index of the transpilePackages array: an inline array, or
+        the array a top-level constant it names is initialized with.
+        """
+        for i, token in enumerate(self.tokens):
+            if token.value != "transpilePackages" or not self.is_punct(
+                i + 1, ":"
+            ):
+                continue
+            if self.is_punct(i + 2, "["):
+                return i + 2
+            if self.is_ident(i + 2):
+                name = self.tokens[i + 2].value
+                for j in range(len(self.tokens) - 3):
+                    if (
+                        self.tokens[j].value in _DECLARATIONS
+                        and self.is_ident(j + 1, name)
+                        and self.is_punct(j + 2, "=")
+                        and self.is_punct(j + 3, "[")
+                    ):
+                        return j + 3
+        return None
+
+
+def _fine_target(parser, first, last):
+    """
+    For `target = [...]`/`target = {...}` or `target.push(...)`/`unshift`
+    where `target` matches FINE_TARGETS, the bracket index whose entries
+    are blocks and the target's name; else (None, None).
+    """
+    path = []
+    i = first
+    while i <= last and (parser.is_ident(i) or parser.is_punct(i, ".")):
+        path.append(parser.tokens[i].value)
+        i += 1
+    dotted = "".join(path)
+    for method in (".push", ".unshift"):
+        if dotted.endswith(method) and parser.is_punct(i, "("):
+            receiver = dotted[: -len(method)]
+            if FINE_TARGETS.search(receiver) and len(parser.elements(i)) > 1:
+                return i, receiver
+            return None, None
+    if (
+        FINE_TARGETS.search(dotted)
+        and parser.is_punct(i, "=")
+        and (parser.is_punct(i + 1, "{") or parser.is_punct(i + 1, "["))
+        and parser.pairs[i + 1] in (last, last - 1)
+    ):
+        return i + 1, dotted
+    return None, None
+
+
+def _statement_blocks(parser, first, last, granularity):
+    """
+    The blocks for one statement: the statement itself, or at the fine
+    granularity its parts when every one of them is a block. Declarations
+    and returns give no blocks.
+    """
+    tokens = parser.tokens
+    if tokens[first].value in _NEVER_BLOCKS:
+        return []
+    lines = parser.line_range(first, last)
+    whole = [Block(*lines, parser.snippet(lines[0]))] if lines else []
+    if granularity != "fine":
+        return whole
+
+    opener, name = _fine_target(parser, first, last)
+    if opener is not None:
+        parts = []
+        for element_first, element_last in parser.elements(opener):
+            element_lines = parser.line_range(element_first, element_last)
+            if element_lines is None:
+                return whole
+            label = f"{name}: {parser.snippet(element_lines[0])}"
+            parts.append(Block(*element_lines, label))
+        return parts or whole
+
+    bodies = parser.bodies(first, last)
+    if not bodies:
+        return whole
+    parts = []
+    for body in bodies:
+        for child_first, child_last in parser.statements(body):
+            child_blocks = _statement_blocks(
+                parser, child_first, child_last, granularity
+            )
+            if (
+                not child_blocks
+                and tokens[child_first].value not in _NEVER_BLOCKS
+            ):
+                return whole
+            parts.extend(child_blocks)
+    return parts or whole
+
+
+def detect_blocks(source, granularity="statement"):
+    """
+    Blocks of the webpack callback in `source` (the config text), as a list
+    of Block(start, end, label) sorted by line and not overlapping. Raises
+    ParseError if the source cannot be tokenized or has no webpack callback.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity!r}")
+    parser = _Parser(source)
+    body = parser.webpack_body()
+    if body is None:
+        raise ParseError("No webpack callback found")
+
+    blocks = []
+    if granularity == "fine":
+        array = parser.transpile_packages_array()
+        if array is not None:
+            for first, last in parser.elements(array):
+                lines = parser.line_range(first, last)
+                if lines is not None:
+                    label = f"transpilePackages: {parser.snippet(lines[0])}"
+                    blocks.append(Block(*lines, label))
+    for first, last in parser.statements(body):
+        blocks.extend(_statement_blocks(parser, first, last, granularity))
+    blocks.sort()
+    return blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="List the blocks the config bisect would search."
+    )
+    parser.add_argument("config", nargs="?", default="next.config.js")
+    parser.add_argument(
+        "--granularity", choices=GRANULARITIES, default="statement"
+    )
+    args = parser.parse_args()
+    with open(args.config, "r", encoding="utf-8") as f:
+        source = f.read()
+    for i, block in enumerate(detect_blocks(source, args.granularity)):
+        print(f"{i:3d}  lines {block.start + 1}-{block.end}  {block.label}")
+
+
+if __name__ == "__main__":
+    main()
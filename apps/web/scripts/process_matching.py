@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+process_matching.py
+
+Shared process matching for cleanup_orphans.py and
+alert_page_finished_loading.py.
+
+  - CmdlineMatcher: precompiled, case-insensitive "all of these substrings"
+    test with an optional pre-filter on the process name, so the (expensive)
+    command line is only fetched for plausible candidates.
+  - ProcessTable: one pass over the process table collecting only cheap
+    attributes (pid, name, ppid), with a parent -> children index so whole
+    process trees can be collected and killed in one pass.
+  - ProcessRegistry: a small PID file that start_dev_server writes to, so
+    that dev servers left behind by an earlier run are found by PID in O(1)
+    instead of by scanning every process.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import psutil  # pip install psutil
+
+REGISTRY_FILE = os.path.join(
+    tempfile.gettempdir(), "next-dev-server-registry.json"
+)
+
+
+class CmdlineMatcher:
+    """
+    Matches processes whose joined, lowercased command line contains every
+    string in `needles`. If `name_prefixes` is given, processes whose name
+    does not start with one of them are rejected before the command line is
+    read.
+    """
+
+    def __init__(self, needles, name_prefixes=None):
+        self.needles = tuple(n.lower() for n in needles)
+        self.name_prefixes = (
+            tuple(p.lower() for p in name_prefixes) if name_prefixes else None
+        )
+
+    def accepts_name(self, name):
+        if self.name_prefixes is None:
+            return True
+        return bool(name) and name.lower().startswith(self.name_prefixes)
+
+    def matches_cmdline(self, cmdline):
+        return all(needle in cmdline for needle in self.needles)
+
+
+# The dev server as started by alert_page_finished_loading.py: the shell that
+# runs "pnpm.cmd run dev" and the node process pnpm starts.
+DEV_SERVER_MATCHER = CmdlineMatcher(
+    ["pnpm.cmd", "run dev"],
+    name_prefixes=["cmd", "node", "pnpm", "sh", "bash", "powershell", "pwsh"],
+)
+ALERT_SCRIPT_MATCHER = CmdlineMatcher(
+    ["alert_page_finished_loading.py"],
+    name_prefixes=["python", "py"],
+)
+
+
+class ProcessTable:
+    """
+    Snapshot of the process table with a parent -> children index.
+    Only pid, name and ppid are read up front; command lines are fetched
+    lazily, and only for processes that pass a matcher's name pre-filter.
+    """
+
+    def __init__(self):
+        self.processes = {}
+        self.children = {}
+        for proc in psutil.process_iter(attrs=["pid", "name", "ppid"]):
+            info = proc.info
+            self.processes[info["pid"]] = proc
+            self.children.setdefault(info["ppid"], []).append(info["pid"])
+
+    def cmdline(self, pid):
+        """
+        Joined, lowercased command line of `pid`, or "" if unavailable.
+        """
+        proc = self.processes.get(pid)
+        if proc is None:
+            return ""
+        try:
+            return " ".join(proc.cmdline() or []).lower()
+        except (
+            psutil.NoSuchProcess,
+            psutil.AccessDenied,
+            psutil.ZombieProcess,
+        ):
+            return ""
+
+    def find(self, matchers, exclude=()):
+        """
+        Returns {pid: cmdline} of every process accepted by any of `matchers`.
+        """
+        found = {}
+        for pid, proc in self.processes.items():
+            if pid in exclude:
+                continue
+            name = proc.info.get("name")
+            candidates = [m for m in matchers if m.accepts_name(name)]
+            if not candidates:
+                continue
+            cmdline = self.cmdline(pid)
+            if cmdline and any(m.matches_cmdline(cmdline) for m in candidates):
+                found[pid] = cmdline
+        return found
+
+    def descendants(self, pid):
+        """
+        PIDs of every process below `pid` in the tree.
+        """
+        result = []
+        seen = {pid}
+        stack = list(self.children.get(pid, ()))
+        while stack:
+            child = stack.pop()
+            if child in seen:
+                continue
+            seen.add(child)
+            result.append(child)
+            stack.extend(self.children.get(child, ()))
+        return result
+
+    def tree(self, roots, exclude=()):
+        """
+        The processes of the trees rooted at `roots`, deduplicated, children
+        before their parents.
+        """
+        seen = set(exclude)
+        ordered = []
+        for root in roots:
+            for pid in self.descendants(root)[::-1] + [root]:
+                if pid not in seen:
+                    seen.add(pid)
+                    ordered.append(pid)
+        return [
+            self.processes.get(pid) or psutil.Process(pid) for pid in ordered
+        ]
+
+
+def kill_processes(processes, verbose=True):
+    """
+    Kills every process in `processes`. Returns the number killed.
+    """
+    killed = 0
+    for proc in processes:
+        try:
+            proc.kill()
+            killed += 1
+        except psutil.NoSuchProcess:
+            continue
+        except psutil.AccessDenied as e:
+            if verbose:
+                print(
+                    f"Could not kill process PID {proc.pid}: {e}",
+                    file=sys.stderr,
+                )
+    return killed
+
+
+class ProcessRegistry:
+    """
+    PID file of the dev servers started by alert_page_finished_loading.py.
+    Entries record the creation time as well, so a PID that was since reused
+    by an unrelated process is never mistaken for a dev server.
+    """
+
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("processes", [])
+        except (OSError, ValueError):
+            return []
+
+    def _save(self, entries):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"processes": entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write {self.path}: {e}", file=sys.stderr)
+
+    def register(self, pid, cmd=""):
+        """
+        Records a started process (and its process group where available).
+        """
+        try:
+            create_time = psutil.Process(pid).create_time()
+        except psutil.NoSuchProcess:
+            return
+        try:
+            pgid = os.getpgid(pid)
+        except (AttributeError, OSError):
+            # Windows: CREATE_NEW_PROCESS_GROUP makes the PID the group ID.
+            pgid = pid
+        entries = [e for e in self._load() if e.get("pid") != pid]
+        entries.append(
+            {"pid": pid, "create_time": create_time, "pgid": pgid, "cmd": cmd}
+        )
+        self._save(entries)
+
+    def unregister(self, pid):
+        entries = self._load()
+        remaining = [e for e in entries if e.get("pid") != pid]
+        if len(remaining) != len(entries):
+            self._save(remaining)
+
+    def alive(self):
+        """
+        psutil.Process objects for registered processes that still run.
+        Stale entries are dropped from the file.
+        """
+        entries = self._load()
+        alive = []
+        kept = []
+        for entry in entries:
+            try:
+                proc = psutil.Process(entry["pid"])
+                if abs(proc.create_time() - entry["create_time"]) > 0.01:
+                    continue
+            except (psutil.NoSuchProcess, KeyError):
+                continue
+            alive.append(proc)
+            kept.append(entry)
+        if len(kept) != len(entries):
+            self._save(kept)
+        return alive
+
+
+def registered_orphan_trees(registry):
+    """
+    The process trees of every registered process that is still alive,
+    children before parents. Only the registered PIDs are looked up, no
+    scan of the process table.
+    """
+    processes = []
+    for proc in registry.alive():
+        try:
+            children = proc.children(recursive=True)
+        except psutil.NoSuchProcess:
+            continue
+        processes.extend(children[::-1])
+        processes.append(proc)
+    return processes
+
+
+def cleanup_orphans(matchers, registry=None, scan=True, verbose=True):
+    """
+    Kills the process trees of orphaned processes: first those in `registry`
+    (by PID), then, if `scan` is set, those accepted by `matchers` in one
+    indexed pass over the process table. The current process and its
+    ancestors are never killed. Returns the number of processes killed.
+    """
+    protected = {os.getpid()}
+    try:
+        protected.update(p.pid for p in psutil.Process().parents())
+    except psutil.Error:
+        pass
+
+    killed = 0
+    if registry is not None:
+        processes = [
+            p
+            for p in registered_orphan_trees(registry)
+            if p.pid not in protected
+        ]
+        for proc in processes:
+            if verbose:
+                print(f"  Killing registered orphan: PID {proc.pid}")
+        killed += kill_processes(processes, verbose)
+
+    if scan:
+        table = ProcessTable()
+        found = table.find(matchers, exclude=protected)
+        for pid, cmdline in found.items():
+            if verbose:
+                print(f"  Killing orphaned process: PID {pid} - {cmdline}")
+        killed += kill_processes(table.tree(found, exclude=protected), verbose)
+    return killed
@@ -11,22 +11,47 @@ This script is an all-encompassing error monitor:
     including additional context lines and suggestions.
   - When you stop the process (e.g. with Ctrl+C), it prints an aggregated summary.
   - It uses fuzzy matching to group together similar (spammy) messages so that repeated
-    low-level debug logs are aggregated rather than printed every time.
+    low-level debug logs are aggregated rather than printed every time. Groups are indexed
+    by (module, errorType), a masked message fingerprint and a MinHash prefilter, so the
+    cost per line stays flat as the number of groups grows. Each group tracks its hits over
+    the aggregation window and its bursts; idle groups (--group-ttl) and the least recently
+    seen ones beyond --max-groups are evicted, and their totals still appear in the summary.
   - For high‑priority errors, if any context lines resemble a stack trace (starting with "at "),
     those lines are parsed into file name, function name, line, and column numbers and captured
     in a dedicated field (detailed_context). In a production system you might further refine this parsing.
   - Extra datamining is performed to attach environment, configuration, and process information.
+    It is collected lazily on a background thread and memoized; reports refer to it by a
+    content hash (enrichment_id) and carry the full block only the first time that hash
+    appears, or again after a config file changes.
   - A new build phase inference is added: by scanning the context buffer for key terms, the script
     deduces which phase of the build (e.g. Compilation, Bundling, Transpilation) is currently active.
 
 Usage:
-    python report_parse_error_monitor.py [--cmd "pnpm run dev"]
+    python report_parse_error_monitor.py [--cmd "pnpm run dev"] [--mode threads|asyncio]
+        [--format pretty|ndjson] [--output -|FILE|unix:/path] [--keep-reports N]
+        [--record FILE]
+    python report_parse_error_monitor.py --replay FILE [--speed X]
+
+With --mode asyncio the output is read in large binary chunks on one event loop and
+classified by a single consumer behind a bounded queue, so bursts of several MB of
+logs apply backpressure to the dev server instead of racing on the error groups.
+
+With --format ndjson each report is one compact JSON line (serialized with orjson when
+it is installed), written to a buffered sink that flushes on --flush-interval or
+--flush-bytes. --keep-reports bounds how many reports stay in memory.
+
+--record saves the dev server output with arrival times; --replay feeds such a file (or
+any plain log) through the same pipeline without starting a process, optionally paced
+by --speed. benchmark_report_parse_error_monitor.py builds its workloads on --replay.
 
 Requirements:
     - Python 3.x
     - (Optional) nltk with VADER sentiment lexicon installed for sentiment analysis.
+    - (Optional) orjson for faster NDJSON serialization.
+    - (Optional) watchdog to keep the module file index current from filesystem events.
 """
 
+import asyncio
 import subprocess
 import threading
 import re
@@ -38,9 +63,11 @@ import os
 import logging
 import time
 import difflib
-from collections import deque
+import hashlib
+import socket
+from collections import OrderedDict, deque
 import platform
-import glob
+import random
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
@@ -145,19 +172,25 @@ def get_environment_info() -> dict:
     return info
 
 
+# Configuration files whose (truncated) contents are attached to reports.
+CONFIG_FILES = [
+    "tsconfig.json",
+    "babel.config.js",
+    ".babelrc",
+    "package.json",
+]
+
+# Minimum number of seconds between checks of the config files' mtimes.
+CONFIG_CHECK_INTERVAL = 1.0
+
+
 def get_config_files_info() -> dict:
     """
     Read key configuration files (e.g. tsconfig.json, babel.config.js, package.json) from the current working directory.
     Returns a dict with file names and truncated content.
     """
-    config_files = [
-        "tsconfig.json",
-        "babel.config.js",
-        ".babelrc",
-        "package.json",
-    ]
     config_info = {}
-    for filename in config_files:
+    for filename in CONFIG_FILES:
         try:
             with open(filename, "r", encoding="utf-8") as f:
                 content = f.read()
@@ -180,12 +213,883 @@ def get_process_info() -> dict:
     }
 
 
+def get_config_files_mtimes() -> tuple:
+    """
+    Return the modification time of each CONFIG_FILES entry (None if missing).
+    """
+    mtimes = []
+    for filename in CONFIG_FILES:
+        try:
+            mtimes.append(os.stat(filename).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+class EnvironmentEnrichment:
+    """
+    Environment, configuration and process information attached to reports.
+
+    Collection happens once, on a background thread started by prefetch(), and
+    the result is memoized. Config files are re-read only when one of their
+    mtimes changes. Each distinct block is identified by a short content hash:
+    reports always carry the hash, and the full block is included only the
+    first time that hash is emitted in the session.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._config_mtimes = None
+        self._last_check = 0.0
+        self.env_info = None
+        self.config_info = None
+        self.process_info = None
+        self.digest = None
+        self.emitted = set()
+
+    def prefetch(self):
+        """
+        Start collecting in the background without blocking the caller.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, daemon=True)
+                self._thread.start()
+
+    def _load(self):
+        self.env_info = get_environment_info()
+        self.process_info = get_process_info()
+        self._load_config(get_config_files_mtimes())
+
+    def _load_config(self, mtimes: tuple):
+        self._config_mtimes = mtimes
+        self.config_info = get_config_files_info()
+        self._last_check = time.monotonic()
+        block = {
+            "env_info": self.env_info,
+            "config_info": self.config_info,
+            "process_info": self.process_info,
+        }
+        self.digest = hashlib.sha1(
+            json.dumps(block, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+
+    def load(self):
+        """
+        Wait for the background collection (starting it if needed) and reload
+        the config files if any of them changed since the last check.
+        """
+        self.prefetch()
+        self._thread.join()
+        now = time.monotonic()
+        if now - self._last_check >= CONFIG_CHECK_INTERVAL:
+            self._last_check = now
+            mtimes = get_config_files_mtimes()
+            if mtimes != self._config_mtimes:
+                self._load_config(mtimes)
+
+    def report_fields(self) -> dict:
+        """
+        Fields to merge into a report: the enrichment hash, plus the full
+        env/config/process block if this hash has not been emitted yet.
+        """
+        self.load()
+        fields = {"enrichment_id": self.digest}
+        if self.digest not in self.emitted:
+            self.emitted.add(self.digest)
+            fields["env_info"] = self.env_info
+            fields["config_info"] = self.config_info
+            fields["process_info"] = self.process_info
+        return fields
+
+
+# Directories that the file-name index never descends into.
+IGNORED_DIRECTORIES = {"node_modules", ".next", ".git"}
+
+# Minimum number of seconds between mtime sweeps of the indexed directories
+# when no filesystem watcher is available.
+FILE_INDEX_REFRESH_INTERVAL = 2.0
+
+
+class FileNameIndex:
+    """
+    In-memory index of file and directory names under a root directory, used
+    to answer "which paths have this keyword in their name" without walking the
+    tree on every error.
+
+    The tree is scanned once with os.scandir, skipping IGNORED_DIRECTORIES and
+    hidden entries (like glob's "**" does). Names are indexed by trigram, so a
+    query intersects a few posting sets and only verifies the surviving names.
+    The index is kept current either from watchdog events (when watchdog is
+    installed) or by re-scanning directories whose mtime changed.
+    """
+
+    def __init__(
+        self,
+        root: str = ".",
+        ignored: set = None,
+        refresh_interval: float = FILE_INDEX_REFRESH_INTERVAL,
+    ):
+        self.root = root
+        self.ignored = IGNORED_DIRECTORIES if ignored is None else ignored
+        self.refresh_interval = refresh_interval
+        self.paths = {}  # entry id -> path relative to root
+        self.names = {}  # entry id -> normalized name
+        self.ids_by_name = {}  # normalized name -> set of entry ids
+        self.trigrams = {}  # trigram -> set of normalized names
+        self.directories = {}  # relative dir -> (mtime_ns, entry ids, subdirs)
+        self._next_id = 0
+        self._last_refresh = 0.0
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._observer = None
+        self._built = False
+
+    @staticmethod
+    def _trigrams(name: str) -> set:
+        return {name[i : i + 3] for i in range(len(name) - 2)}
+
+    def _add_entry(self, path: str, name: str) -> int:
+        entry_id = self._next_id
+        self._next_id += 1
+        name = os.path.normcase(name)
+        self.paths[entry_id] = path
+        self.names[entry_id] = name
+        ids = self.ids_by_name.get(name)
+        if ids is None:
+            self.ids_by_name[name] = {entry_id}
+            for trigram in self._trigrams(name):
+                self.trigrams.setdefault(trigram, set()).add(name)
+        else:
+            ids.add(entry_id)
+        return entry_id
+
+    def _remove_entry(self, entry_id: int):
+        del self.paths[entry_id]
+        name = self.names.pop(entry_id)
+        ids = self.ids_by_name[name]
+        ids.discard(entry_id)
+        if not ids:
+            del self.ids_by_name[name]
+            for trigram in self._trigrams(name):
+                names = self.trigrams[trigram]
+                names.discard(name)
+                if not names:
+                    del self.trigrams[trigram]
+
+    def _scan_shallow(self, relative_dir: str):
+        """
+        Index the direct entries of one directory.
+        """
+        directory = os.path.join(self.root, relative_dir)
+        entry_ids = []
+        subdirs = []
+        mtime = None
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir and entry.name in self.ignored:
+                        continue
+                    path = os.path.join(relative_dir, entry.name)
+                    entry_ids.append(self._add_entry(path, entry.name))
+                    if is_dir:
+                        subdirs.append(path)
+        except OSError:
+            pass
+        self.directories[relative_dir] = (mtime, entry_ids, subdirs)
+
+    def _scan(self, relative_dir: str):
+        """
+        Index `relative_dir` and everything below it.
+        """
+        pending = [relative_dir]
+        while pending:
+            current = pending.pop()
+            self._scan_shallow(current)
+            pending.extend(self.directories[current][2])
+
+    def _forget(self, relative_dir: str):
+        """
+        Drop `relative_dir` and everything below it from the index.
+        """
+        pending = [relative_dir]
+        while pending:
+            record = self.directories.pop(pending.pop(), None)
+            if record is None:
+                continue
+            _, entry_ids, subdirs = record
+            for entry_id in entry_ids:
+                self._remove_entry(entry_id)
+            pending.extend(subdirs)
+
+    def _rescan(self, relative_dir: str):
+        """
+        Re-index a directory whose contents changed, scanning new
+        subdirectories and forgetting removed ones.
+        """
+        record = self.directories.get(relative_dir)
+        if record is None:
+            return
+        _, entry_ids, old_subdirs = record
+        for entry_id in entry_ids:
+            self._remove_entry(entry_id)
+        self._scan_shallow(relative_dir)
+        new_subdirs = self.directories[relative_dir][2]
+        for subdir in set(old_subdirs).difference(new_subdirs):
+            self._forget(subdir)
+        for subdir in new_subdirs:
+            if subdir not in self.directories:
+                self._scan(subdir)
+
+    def build(self):
+        """
+        Scan the whole tree once and start watching it if possible.
+        """
+        with self._lock:
+            if self._built:
+                return
+            self._scan("")
+            self._built = True
+            self._last_refresh = time.monotonic()
+        self._start_watching()
+
+    def _start_watching(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return
+
+        index = self
+
+        class _DirtyDirectoryHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    if path:
+                        index._mark_dirty(path)
+
+        observer = Observer()
+        try:
+            observer.schedule(
+                _DirtyDirectoryHandler(), self.root, recursive=True
+            )
+            observer.daemon = True
+            observer.start()
+        except OSError as e:
+            logging.info(
+                f"File watching unavailable ({e}); using mtime checks."
+            )
+            return
+        self._observer = observer
+
+    def _mark_dirty(self, path: str):
+        try:
+            relative = os.path.relpath(os.path.dirname(path), self.root)
+        except ValueError:
+            return
+        if relative == ".":
+            relative = ""
+        parts = relative.split(os.sep)
+        if any(part in self.ignored for part in parts):
+            return
+        with self._lock:
+            self._dirty.add(relative)
+
+    def refresh(self):
+        """
+        Bring the index up to date: re-scan directories reported by the
+        watcher, or (without one) those whose mtime changed since the last
+        sweep, at most once per refresh_interval.
+        """
+        if not self._built:
+            self.build()
+            return
+        with self._lock:
+            if self._observer is not None:
+                dirty, self._dirty = self._dirty, set()
+            else:
+                now = time.monotonic()
+                if now - self._last_refresh < self.refresh_interval:
+                    return
+                self._last_refresh = now
+                dirty = set()
+                for relative_dir, record in self.directories.items():
+                    try:
+                        mtime = os.stat(
+                            os.path.join(self.root, relative_dir)
+                        ).st_mtime_ns
+                    except OSError:
+                        mtime = None
+                    if mtime != record[0]:
+                        dirty.add(relative_dir)
+            for relative_dir in sorted(dirty, key=len):
+                self._rescan(relative_dir)
+
+    def query(self, keyword: str) -> list:
+        """
+        Return the indexed paths whose name contains `keyword`.
+        """
+        keyword = os.path.normcase(keyword)
+        if len(keyword) < 3:
+            names = [name for name in self.ids_by_name if keyword in name]
+        else:
+            postings = []
+            for trigram in self._trigrams(keyword):
+                names = self.trigrams.get(trigram)
+                if not names:
+                    return []
+                postings.append(names)
+            postings.sort(key=len)
+            names = [
+                name
+                for name in postings[0].intersection(*postings[1:])
+                if keyword in name
+            ]
+        return sorted(
+            self.paths[entry_id]
+            for name in names
+            for entry_id in self.ids_by_name[name]
+        )
+
+
+_file_index = None
+
+
 def get_module_files_info(keyword: str) -> list:
     """
     Search for files in the current directory and subdirectories that contain the keyword.
     This can help correlate an error (e.g. page: '/welcome') with related source files.
+    Lookups go through a FileNameIndex of the working directory that is built on first use.
+    """
+    global _file_index
+    if _file_index is None:
+        _file_index = FileNameIndex(os.getcwd())
+    _file_index.refresh()
+    return _file_index.query(keyword)
+
+
+# Keywords recognized by the line classifier, in the precedence order used by
+# extractErrorType. Each entry is (keyword, error type, triggers): the error type
+# is None for keywords that only mark a line as reportable, and `triggers` says
+# whether the keyword alone makes process_stream report the line.
+ERROR_KEYWORDS = [
+    ("ProxyNativeModule", "BabelScopeError", True),
+    ("Module not found", "ModuleNotFoundError", True),
+    ("Unexpected token", "SyntaxError", True),
+    ("cannot read properties of undefined", "UndefinedPropertyError", False),
+    ("tap", "HookRegistrationError", False),
+    ("ReferenceError", "ReferenceError", True),
+    ("TypeError", "TypeError", True),
+    ("RangeError", "RangeError", True),
+    ("SyntaxError", None, True),
+    ("UndefinedPropertyError", None, True),
+    ("HookRegistrationError", None, True),
+]
+
+# The keywords are plain literals matched case-insensitively, so the classifier
+# lowercases a line once and tests it with substring searches, which CPython
+# runs much faster than an IGNORECASE regex alternation over the same words.
+_TRIGGER_NEEDLES = tuple(
+    keyword.lower() for keyword, _, triggers in ERROR_KEYWORDS if triggers
+)
+_TYPE_NEEDLES = tuple(
+    (keyword.lower(), errorType)
+    for keyword, errorType, _ in ERROR_KEYWORDS
+    if errorType is not None
+)
+ERROR_NAME_PATTERN = re.compile(r"^([A-Za-z]+Error)")
+
+
+def _classify_lowered(message: str, lowered: str, error_name: str) -> str:
+    needle, errorType = _TYPE_NEEDLES[0]
+    if needle in lowered:
+        return errorType
+    if error_name and error_name != "Error":
+        return error_name
+    for needle, errorType in _TYPE_NEEDLES[1:]:
+        if needle in lowered:
+            return errorType
+    m = ERROR_NAME_PATTERN.match(message)
+    if m:
+        return m.group(1)
+    return "UnknownError"
+
+
+def classify_error(message: str, error_name: str = None) -> str:
+    """
+    Return the error type for a message, following extractErrorType's
+    precedence: ProxyNativeModule, then an explicit error name, then the
+    remaining keywords in order, then a leading "...Error" word.
+    """
+    return _classify_lowered(message, message.lower(), error_name)
+
+
+def classify_line(line: str):
+    """
+    Decide whether an output line should be reported and, if so, what its error
+    type is. Returns the error type, or None for ordinary lines.
+    """
+    lowered = line.lower()
+    for needle in _TRIGGER_NEEDLES:
+        if needle in lowered:
+            return _classify_lowered(line, lowered, None)
+    return None
+
+
+# Messages whose difflib ratio reaches this value are folded into one group.
+SIMILARITY_THRESHOLD = 0.8
+
+# Masks applied (in order) to build a message fingerprint. Lines that differ
+# only in numbers, file paths or content hashes share a fingerprint and are
+# grouped without running difflib at all.
+FINGERPRINT_MASKS = [
+    (
+        re.compile(
+            r"(?:[A-Za-z]:)?(?:\.{0,2}[\\/])?[\w.@\-]+(?:[\\/][\w.@\-]+)+"
+        ),
+        "<path>",
+    ),
+    (re.compile(r"\b(?=[0-9a-f]*\d)[0-9a-f]{7,}\b", re.I), "<hash>"),
+    (re.compile(r"\d+"), "<n>"),
+]
+
+# MinHash / LSH parameters for the similarity prefilter. Two messages become
+# difflib candidates when all rows of at least one band agree, which happens
+# with high probability once their token sets overlap substantially.
+MINHASH_BANDS = 8
+MINHASH_ROWS = 2
+_MINHASH_MASK = (1 << 64) - 1
+_minhash_rng = random.Random(0x5EED)
+_MINHASH_PARAMS = [
+    (_minhash_rng.getrandbits(64) | 1, _minhash_rng.getrandbits(64))
+    for _ in range(MINHASH_BANDS * MINHASH_ROWS)
+]
+
+# Per-lookup work limits that keep the cost independent of the group count.
+MAX_BAND_CANDIDATES = 32
+MAX_SEQUENCE_CANDIDATES = 4
+
+
+def fingerprint_message(message: str) -> str:
+    """
+    Normalize a message by masking paths, hashes and numbers.
+    """
+    for pattern, placeholder in FINGERPRINT_MASKS:
+        message = pattern.sub(placeholder, message)
+    return message
+
+
+class MessageSignature:
+    """
+    Lookup keys for one message: its fingerprint, plus a token set and MinHash
+    band keys that are only computed when the fingerprint alone is not enough.
+    """
+
+    __slots__ = ("fingerprint", "_tokens", "_bands")
+
+    def __init__(self, message: str):
+        self.fingerprint = fingerprint_message(message)
+        self._tokens = None
+        self._bands = None
+
+    @property
+    def tokens(self) -> frozenset:
+        if self._tokens is None:
+            self._tokens = frozenset(
+                re.findall(r"\w+", self.fingerprint.lower())
+            )
+        return self._tokens
+
+    @property
+    def bands(self) -> list:
+        if self._bands is None:
+            self._bands = []
+            hashes = [hash(token) for token in self.tokens]
+            if hashes:
+                minhashes = [
+                    min(((a * h + b) & _MINHASH_MASK) for h in hashes)
+                    for a, b in _MINHASH_PARAMS
+                ]
+                self._bands = [
+                    (
+                        band,
+                        tuple(
+                            minhashes[
+                                band * MINHASH_ROWS : (band + 1) * MINHASH_ROWS
+                            ]
+                        ),
+                    )
+                    for band in range(MINHASH_BANDS)
+                ]
+        return self._bands
+
+
+class _GroupBucket:
+    """
+    All groups that share a (module, errorType) pair.
+    """
+
+    __slots__ = ("by_fingerprint", "by_band", "signatures")
+
+    def __init__(self):
+        self.by_fingerprint = {}
+        self.by_band = {}
+        self.signatures = {}
+
+
+class ErrorGroupIndex:
+    """
+    Index over error groups used by ReportParseErrorMonitor.reportError.
+
+    Groups are bucketed by (module, errorType). Within a bucket a lookup tries,
+    in order:
+      1. an exact hit on the masked message fingerprint,
+      2. a MinHash/LSH prefilter that yields a handful of candidates, ranked
+         by token-set Jaccard similarity,
+      3. difflib.SequenceMatcher on at most MAX_SEQUENCE_CANDIDATES of them.
+    The amount of work per lookup is bounded, so it does not grow with the
+    number of groups.
+    """
+
+    def __init__(self, similarity_threshold: float = SIMILARITY_THRESHOLD):
+        self.similarity_threshold = similarity_threshold
+        self.buckets = {}
+
+    def signature(self, message: str) -> MessageSignature:
+        return MessageSignature(message)
+
+    def find(
+        self,
+        module: str,
+        errorType: str,
+        message: str,
+        signature: MessageSignature = None,
+    ):
+        """
+        Return the group that the message belongs to, or None.
+        """
+        bucket = self.buckets.get((module, errorType))
+        if bucket is None:
+            return None
+        if signature is None:
+            signature = self.signature(message)
+
+        group = bucket.by_fingerprint.get(signature.fingerprint)
+        if group is not None:
+            return group
+
+        candidates = {}
+        for key in signature.bands:
+            groups = bucket.by_band.get(key)
+            if groups:
+                for group in groups[-MAX_BAND_CANDIDATES:]:
+                    candidates[id(group)] = group
+        if not candidates:
+            return None
+
+        tokens = signature.tokens
+        ranked = []
+        for group in candidates.values():
+            group_tokens = bucket.signatures[id(group)].tokens
+            union = len(tokens | group_tokens)
+            overlap = len(tokens & group_tokens) / union if union else 0.0
+            ranked.append((overlap, group))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+
+        matcher = difflib.SequenceMatcher(None)
+        matcher.set_seq2(message)
+        for _, group in ranked[:MAX_SEQUENCE_CANDIDATES]:
+            matcher.set_seq1(group["message"])
+            if (
+                matcher.real_quick_ratio() >= self.similarity_threshold
+                and matcher.quick_ratio() >= self.similarity_threshold
+                and matcher.ratio() >= self.similarity_threshold
+            ):
+                return group
+        return None
+
+    def add(self, group: dict, signature: MessageSignature = None):
+        """
+        Register a newly created group with the index.
+        """
+        if signature is None:
+            signature = self.signature(group["message"])
+        bucket = self.buckets.setdefault(
+            (group["module"], group["errorType"]), _GroupBucket()
+        )
+        bucket.by_fingerprint.setdefault(signature.fingerprint, group)
+        bucket.signatures[id(group)] = signature
+        for key in signature.bands:
+            bucket.by_band.setdefault(key, []).append(group)
+
+    def remove(self, group: dict):
+        """
+        Drop a group from the index.
+        """
+        key = (group["module"], group["errorType"])
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+        signature = bucket.signatures.pop(id(group), None)
+        if signature is None:
+            return
+        if bucket.by_fingerprint.get(signature.fingerprint) is group:
+            del bucket.by_fingerprint[signature.fingerprint]
+        for band in signature.bands:
+            groups = bucket.by_band.get(band)
+            if groups is None:
+                continue
+            for i, candidate in enumerate(groups):
+                if candidate is group:
+                    del groups[i]
+                    break
+            if not groups:
+                del bucket.by_band[band]
+        if not bucket.signatures:
+            del self.buckets[key]
+
+
+# Defaults for ErrorGroupStore eviction: the maximum number of live groups, and
+# the number of idle seconds after which a group is dropped (None disables it).
+MAX_ERROR_GROUPS = 10000
+GROUP_TTL = 3600.0
+
+
+class _GroupStats:
+    """
+    Per-second hit counts of one group over the aggregation window.
+    """
+
+    __slots__ = ("buckets",)
+
+    def __init__(self):
+        self.buckets = deque()
+
+    def record(self, now: float, window: float):
+        second = int(now)
+        if self.buckets and self.buckets[-1][0] == second:
+            self.buckets[-1][1] += 1
+        else:
+            self.buckets.append([second, 1])
+        self.expire(now, window)
+
+    def expire(self, now: float, window: float):
+        horizon = now - window
+        while self.buckets and self.buckets[0][0] + 1 <= horizon:
+            self.buckets.popleft()
+
+    def count(self, now: float, window: float) -> int:
+        self.expire(now, window)
+        return sum(count for _, count in self.buckets)
+
+
+class ErrorGroupStore:
     """
-    return glob.glob(f"**/*{keyword}*", recursive=True)
+    Bounded collection of error groups for ReportParseErrorMonitor.
+
+    Groups live in least-recently-seen order and are looked up through an
+    ErrorGroupIndex. Every hit is counted in per-second buckets covering the
+    aggregation window, so each group knows its recent rate; a hit that arrives
+    after the group has been quiet for a whole window starts a new burst.
+    Groups idle for longer than `ttl` seconds, or the least recently seen ones
+    beyond `max_groups`, are evicted, and their totals are folded into
+    `evicted` (keyed by module and errorType) so the summary still counts them.
+    Iterating the store yields the live groups, oldest first.
+    """
+
+    def __init__(
+        self,
+        window: float = 2.0,
+        max_groups: int = MAX_ERROR_GROUPS,
+        ttl: float = GROUP_TTL,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+    ):
+        self.window = window
+        self.max_groups = max_groups
+        self.ttl = ttl
+        self.index = ErrorGroupIndex(similarity_threshold)
+        self.groups = OrderedDict()
+        self.stats = {}
+        self.evicted = {}
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(list(self.groups.values()))
+
+    def find(
+        self,
+        module: str,
+        errorType: str,
+        message: str,
+        signature: MessageSignature = None,
+    ):
+        return self.index.find(module, errorType, message, signature)
+
+    def hit(self, group: dict, now: float):
+        """
+        Count another occurrence of an existing group.
+        """
+        if now - group["last_time"] >= self.window:
+            group["bursts"] = group.get("bursts", 1) + 1
+        group["count"] += 1
+        group["last_time"] = now
+        self.stats[id(group)].record(now, self.window)
+        self.groups.move_to_end(id(group))
+        self.evict(now)
+
+    def add(self, group: dict, now: float, signature: MessageSignature = None):
+        """
+        Store a new group and evict stale or excess groups.
+        """
+        group.setdefault("bursts", 1)
+        self.groups[id(group)] = group
+        stats = _GroupStats()
+        stats.record(now, self.window)
+        self.stats[id(group)] = stats
+        self.index.add(group, signature)
+        self.evict(now)
+
+    def recent_count(self, group: dict, now: float) -> int:
+        """
+        Number of hits of `group` within the last aggregation window.
+        """
+        return self.stats[id(group)].count(now, self.window)
+
+    def evict(self, now: float):
+        while self.groups:
+            oldest = next(iter(self.groups.values()))
+            expired = (
+                self.ttl is not None and now - oldest["last_time"] > self.ttl
+            )
+            if not expired and len(self.groups) <= self.max_groups:
+                break
+            self._evict(oldest)
+
+    def _evict(self, group: dict):
+        del self.groups[id(group)]
+        del self.stats[id(group)]
+        self.index.remove(group)
+        key = (group["module"], group["errorType"])
+        totals = self.evicted.get(key)
+        if totals is None:
+            totals = self.evicted[key] = {
+                "module": group["module"],
+                "errorType": group["errorType"],
+                "groups": 0,
+                "count": 0,
+            }
+        totals["groups"] += 1
+        totals["count"] += group["count"]
+        if "priority" in group:
+            totals["priority"] = group["priority"]
+
+
+# Buffered report sinks flush when this many bytes are pending, or when the
+# oldest pending report is this many seconds old.
+SINK_FLUSH_BYTES = 1 << 16
+SINK_FLUSH_INTERVAL = 1.0
+
+# (Optional) orjson for faster compact serialization of NDJSON reports.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def serialize_report(report: dict, fmt: str = "pretty") -> str:
+    """
+    Serialize a report as indented JSON ("pretty") or as one compact line
+    ("ndjson"), using orjson for the latter when it is installed.
+    """
+    if fmt == "ndjson":
+        if orjson is not None:
+            return orjson.dumps(report, default=str).decode("utf-8")
+        return json.dumps(report, separators=(",", ":"), default=str)
+    return json.dumps(report, indent=2)
+
+
+class ReportSink:
+    """
+    Destination for serialized reports: "-" for stdout, "unix:/path" for a
+    Unix domain socket, or a file path (opened for appending).
+
+    Writes are buffered and flushed once flush_bytes are pending or
+    flush_interval seconds have passed; a flush_bytes of 0 writes through
+    immediately, like print.
+    """
+
+    def __init__(
+        self,
+        target: str = "-",
+        flush_bytes: int = SINK_FLUSH_BYTES,
+        flush_interval: float = SINK_FLUSH_INTERVAL,
+    ):
+        self.target = target
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.pending_size = 0
+        self._lock = threading.Lock()
+        self._stream = None
+        self._socket = None
+        self._closed = threading.Event()
+        self._flusher = None
+        if target.startswith("unix:"):
+            if not hasattr(socket, "AF_UNIX"):
+                raise OSError("Unix sockets are not supported here")
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(target[len("unix:") :])
+        elif target != "-":
+            self._stream = open(target, "a", encoding="utf-8")
+        if flush_bytes > 0 and flush_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, daemon=True
+            )
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def write(self, text: str):
+        with self._lock:
+            self.pending.append(text)
+            self.pending_size += len(text)
+            if self.pending_size < self.flush_bytes:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self.pending:
+                return
+            data = "".join(self.pending)
+            self.pending = []
+            self.pending_size = 0
+            if self._socket is not None:
+                self._socket.sendall(data.encode("utf-8"))
+            else:
+                stream = self._stream if self._stream else sys.stdout
+                stream.write(data)
+                stream.flush()
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+        if self._stream is not None:
+            self._stream.close()
+        if self._socket is not None:
+            self._socket.close()
 
 
 class ReportParseErrorMonitor:
@@ -196,14 +1100,53 @@ class ReportParseErrorMonitor:
             "showSummary": True,
             "contextLines": 5,
             "aggregationWindow": 2.0,
+            # Error group eviction: maximum live groups, and idle seconds
+            # before a group is dropped (None keeps idle groups).
+            "maxErrorGroups": MAX_ERROR_GROUPS,
+            "groupTTL": GROUP_TTL,
+            # "pretty" (indented JSON) or "ndjson" (one compact line each).
+            "format": "pretty",
+            # Keep only this many recent reports in errorReports (None keeps
+            # every report).
+            "maxReportsKept": None,
+            # ReportSink to write to; defaults to stdout.
+            "sink": None,
         }
         if options:
             self.options.update(options)
-        self.errorGroups = []
-        self.errorReports = []
-        self.env_info = get_environment_info()
-        self.config_info = get_config_files_info()
-        self.process_info = get_process_info()
+        self.errorGroups = ErrorGroupStore(
+            window=self.options["aggregationWindow"],
+            max_groups=self.options["maxErrorGroups"],
+            ttl=self.options["groupTTL"],
+        )
+        max_kept = self.options["maxReportsKept"]
+        self.errorReports = [] if max_kept is None else deque(maxlen=max_kept)
+        self.sink = self.options["sink"]
+        if self.sink is None:
+            self.sink = ReportSink(
+                "-",
+                flush_bytes=(
+                    SINK_FLUSH_BYTES
+                    if self.options["format"] == "ndjson"
+                    else 0
+                ),
+            )
+        self.enrichment = EnvironmentEnrichment()
+
+    @property
+    def env_info(self) -> dict:
+        self.enrichment.load()
+        return self.enrichment.env_info
+
+    @property
+    def config_info(self) -> dict:
+        self.enrichment.load()
+        return self.enrichment.config_info
+
+    @property
+    def process_info(self) -> dict:
+        self.enrichment.load()
+        return self.enrichment.process_info
 
     def getPackageName(self, moduleResource: str) -> str:
         if not moduleResource:
@@ -222,29 +1165,7 @@ class ReportParseErrorMonitor:
     def extractErrorType(
         self, message: str, error_name: str = None, loc: dict = None
     ) -> str:
-        errorType = "UnknownError"
-        if re.search(r"ProxyNativeModule", message, re.I):
-            errorType = "BabelScopeError"
-        elif error_name and error_name != "Error":
-            errorType = error_name
-        elif re.search(r"Module not found", message, re.I):
-            errorType = "ModuleNotFoundError"
-        elif re.search(r"Unexpected token", message, re.I):
-            errorType = "SyntaxError"
-        elif re.search(r"cannot read properties of undefined", message, re.I):
-            errorType = "UndefinedPropertyError"
-        elif re.search(r"tap", message, re.I):
-            errorType = "HookRegistrationError"
-        elif re.search(r"ReferenceError", message, re.I):
-            errorType = "ReferenceError"
-        elif re.search(r"TypeError", message, re.I):
-            errorType = "TypeError"
-        elif re.search(r"RangeError", message, re.I):
-            errorType = "RangeError"
-        else:
-            m = re.match(r"^([A-Za-z]+Error)", message)
-            if m:
-                errorType = m.group(1)
+        errorType = classify_error(message, error_name)
         if loc:
             errorType += (
                 f" (at {loc.get('line', '?')}:{loc.get('column', '?')})"
@@ -256,43 +1177,29 @@ class ReportParseErrorMonitor:
         message: str,
         moduleResource: str = "Unknown module",
         context: list = None,
+        errorType: str = None,
     ):
         """
         Process an error message line and log it as a structured JSON report.
+        `errorType` may be passed in when the caller already classified the line.
         Uses fuzzy matching to group similar messages within the aggregation window.
         For high-priority errors, it parses stack trace lines and infers the build phase.
         Additionally, extra environment, configuration, process, and module file information is attached.
         """
-        errorType = self.extractErrorType(message)
+        if errorType is None:
+            errorType = self.extractErrorType(message)
         current_time = time.time()
-        WINDOW = self.options.get("aggregationWindow", 2.0)
-        SIMILARITY_THRESHOLD = 0.8
-
-        sentiment = get_sentiment(message)
-        group_found = None
 
-        for group in self.errorGroups:
-            if (
-                group["module"] == moduleResource
-                and group["errorType"] == errorType
-            ):
-                similarity = difflib.SequenceMatcher(
-                    None, group["message"], message
-                ).ratio()
-                if similarity >= SIMILARITY_THRESHOLD:
-                    group_found = group
-                    break
+        signature = MessageSignature(message)
+        group_found = self.errorGroups.find(
+            moduleResource, errorType, message, signature
+        )
 
         if group_found:
-            if current_time - group_found["last_time"] < WINDOW:
-                group_found["count"] += 1
-                group_found["last_time"] = current_time
-                return
-            else:
-                group_found["count"] += 1
-                group_found["last_time"] = current_time
-                return
+            self.errorGroups.hit(group_found, current_time)
+            return
 
+        sentiment = get_sentiment(message)
         new_group = {
             "module": moduleResource,
             "errorType": errorType,
@@ -325,7 +1232,7 @@ class ReportParseErrorMonitor:
                 module_files = get_module_files_info(keyword)
             new_group["module_files"] = module_files
 
-        self.errorGroups.append(new_group)
+        self.errorGroups.add(new_group, current_time, signature)
 
         report = {
             "severity": "ERROR",
@@ -336,9 +1243,7 @@ class ReportParseErrorMonitor:
             "message": message,
             "sentiment": sentiment,
             "timestamp": datetime.datetime.now().isoformat(),
-            "env_info": self.env_info,
-            "config_info": self.config_info,
-            "process_info": self.process_info,
+            **self.enrichment.report_fields(),
         }
         if context:
             report["context"] = context
@@ -367,12 +1272,15 @@ class ReportParseErrorMonitor:
             report["stack"] = (
                 "Stack not available from stdout. Consider running with source maps enabled and NODE_OPTIONS=--trace-deprecation"
             )
-        print(json.dumps(report, indent=2))
+        self.emit(report)
         self.errorReports.append(report)
 
     def printSummary(self):
+        now = time.time()
         overall_severity = "INFO"
-        for group in self.errorGroups:
+        for group in list(self.errorGroups) + list(
+            self.errorGroups.evicted.values()
+        ):
             if group.get("priority") == "CRITICAL":
                 overall_severity = "CRITICAL"
                 break
@@ -392,35 +1300,94 @@ class ReportParseErrorMonitor:
                 "message": group["message"],
                 "sentiment": group["sentiment"],
                 "count": group["count"],
+                "bursts": group["bursts"],
+                "recent_count": self.errorGroups.recent_count(group, now),
             }
             if "priority" in group:
                 entry["priority"] = group["priority"]
             summary["summary"].append(entry)
-        print(json.dumps(summary, indent=2))
+        if self.errorGroups.evicted:
+            summary["evicted"] = [
+                dict(totals, package=self.getPackageName(totals["module"]))
+                for totals in self.errorGroups.evicted.values()
+            ]
+        self.emit(summary)
+
+    def emit(self, report: dict):
+        """
+        Serialize a report in the configured format and write it to the sink.
+        """
+        self.sink.write(
+            serialize_report(report, self.options["format"]) + "\n"
+        )
+
+    def close(self):
+        """
+        Flush and close the report sink.
+        """
+        self.sink.close()
 
 
-def monitor_process_output(process, monitor):
-    def process_stream(stream, stream_name):
-        context_buffer = deque(maxlen=monitor.options["contextLines"])
-        for line in iter(stream.readline, ""):
-            if line:
+# Read size for the asyncio reader and the number of chunks that may be queued
+# for the classifier before the readers stop draining the pipes.
+STREAM_CHUNK_SIZE = 1 << 16
+LINE_QUEUE_SIZE = 64
+# A partial line carried over between reads is passed on as a line of its own
+# once it grows past this many bytes, so a runaway line without newlines
+# cannot grow memory without limit or stall the classifier.
+MAX_PARTIAL_LINE = 4 << 20
+# Echoed output is written once this many characters have accumulated, or when
+# the classifier runs out of queued input.
+ECHO_BATCH_SIZE = 1 << 16
+# Queued by monitor_process_output_async once both pipes are exhausted.
+STREAM_DONE = object()
+
+
+def process_line(monitor, message: str, context_buffer: deque):
+    """
+    Classify one stripped output line and report it if it is an error.
+    """
+    context_buffer.append(message)
+    errorType = classify_line(message)
+    if errorType is not None:
+        monitor.reportError(
+            message,
+            context=list(context_buffer),
+            errorType=errorType,
+        )
+
+
+def process_stream(stream, monitor, lock=None, echo=True, recorder=None):
+    """
+    Read a text stream line by line, echo each line, optionally record it, and
+    pass it to process_line. `lock` serializes access to the monitor when
+    several streams are processed concurrently.
+    """
+    if lock is None:
+        lock = threading.Lock()
+    context_buffer = deque(maxlen=monitor.options["contextLines"])
+    for line in iter(stream.readline, ""):
+        if line:
+            if echo:
                 print(line, end="")
-                context_buffer.append(line.strip())
-                if re.search(
-                    r"SyntaxError|Module not found|Unexpected token|ReferenceError|TypeError|RangeError|UndefinedPropertyError|HookRegistrationError|ProxyNativeModule",
-                    line,
-                    re.I,
-                ):
-                    monitor.reportError(
-                        line.strip(), context=list(context_buffer)
-                    )
-        stream.close()
+            if recorder is not None:
+                recorder.write(line)
+            with lock:
+                process_line(monitor, line.strip(), context_buffer)
+    stream.close()
+
 
+def monitor_process_output(process, monitor, recorder=None):
+    lock = threading.Lock()
     t_stdout = threading.Thread(
-        target=process_stream, args=(process.stdout, "stdout")
+        target=process_stream,
+        args=(process.stdout, monitor, lock),
+        kwargs={"recorder": recorder},
     )
     t_stderr = threading.Thread(
-        target=process_stream, args=(process.stderr, "stderr")
+        target=process_stream,
+        args=(process.stderr, monitor, lock),
+        kwargs={"recorder": recorder},
     )
     t_stdout.start()
     t_stderr.start()
@@ -428,6 +1395,231 @@ def monitor_process_output(process, monitor):
     t_stderr.join()
 
 
+# Lines written by LogRecorder start with the seconds elapsed since recording
+# began, followed by a tab.
+RECORDED_LINE_PATTERN = re.compile(r"^(\d+\.\d+)\t")
+
+
+class LogRecorder:
+    """
+    Writes every output line to a file, prefixed with its arrival time, so the
+    session can later be fed back through --replay at its original pace.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "w", encoding="utf-8")
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, line: str):
+        if not line.endswith("\n"):
+            line += "\n"
+        with self._lock:
+            self.file.write(f"{time.monotonic() - self.start:.3f}\t{line}")
+
+    def close(self):
+        self.file.close()
+
+
+class ReplayStream:
+    """
+    Text-stream stand-in that reads a recorded log for process_stream.
+
+    Timestamp prefixes written by LogRecorder are stripped. With a `speed`
+    multiplier, readline waits until each line's recorded time divided by the
+    speed; without one (or for plain logs) lines are replayed as fast as they
+    can be processed.
+    """
+
+    def __init__(self, path: str, speed: float = None):
+        self.file = open(path, "r", encoding="utf-8", errors="replace")
+        self.speed = speed
+        self.start = time.monotonic()
+
+    def readline(self) -> str:
+        line = self.file.readline()
+        if not line:
+            return ""
+        m = RECORDED_LINE_PATTERN.match(line)
+        if m:
+            line = line[m.end() :]
+            if self.speed:
+                due = self.start + float(m.group(1)) / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        return line
+
+    def close(self):
+        self.file.close()
+
+
+def replay_log(path: str, monitor, speed: float = None, echo: bool = True):
+    """
+    Feed a recorded log through the same process_stream -> reportError path
+    used for a live dev server.
+    """
+    process_stream(ReplayStream(path, speed), monitor, echo=echo)
+
+
+class BatchedWriter:
+    """
+    Collects echoed output and writes it to a text stream in large batches
+    instead of one print call per line.
+    """
+
+    def __init__(self, stream=None, batch_size: int = ECHO_BATCH_SIZE):
+        self.stream = stream if stream is not None else sys.stdout
+        self.batch_size = batch_size
+        self.pending = []
+        self.pending_size = 0
+
+    def write(self, text: str):
+        if not text:
+            return
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.stream.write("".join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+        self.stream.flush()
+
+
+async def read_stream_chunks(stream, stream_name, queue, chunk_size):
+    """
+    Read a subprocess pipe in large binary chunks and queue (stream_name, text)
+    items that hold only complete lines. Each chunk is decoded once; the pieces
+    of a trailing partial line are kept as they arrive and joined once its
+    newline does (or once they pass MAX_PARTIAL_LINE). Awaiting queue.put
+    applies backpressure to the pipe when the classifier falls behind.
+    """
+    pending = []
+    pending_size = 0
+    while True:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            break
+        cut = chunk.rfind(b"\n") + 1
+        if cut == 0:
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= MAX_PARTIAL_LINE:
+                text = b"".join(pending).decode("utf-8", errors="replace")
+                pending = []
+                pending_size = 0
+                await queue.put((stream_name, text + "\n"))
+            continue
+        if pending:
+            pending.append(chunk[:cut])
+            lines = b"".join(pending)
+        else:
+            lines = chunk[:cut]
+        if cut < len(chunk):
+            pending = [chunk[cut:]]
+            pending_size = len(chunk) - cut
+        else:
+            pending = []
+            pending_size = 0
+        await queue.put((stream_name, lines.decode("utf-8", errors="replace")))
+    if pending:
+        await queue.put(
+            (
+                stream_name,
+                b"".join(pending).decode("utf-8", errors="replace") + "\n",
+            )
+        )
+
+
+async def classify_queued_lines(queue, monitor, writer, recorder=None):
+    """
+    Single consumer for read_stream_chunks: echoes text through the batched
+    writer and classifies every line. Because only this task touches the
+    monitor, errorGroups needs no lock.
+    """
+    context_buffers = {}
+    while True:
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            writer.flush()
+            item = await queue.get()
+        if item is STREAM_DONE:
+            break
+        stream_name, text = item
+        context_buffer = context_buffers.get(stream_name)
+        if context_buffer is None:
+            context_buffer = deque(maxlen=monitor.options["contextLines"])
+            context_buffers[stream_name] = context_buffer
+
+        echo_start = 0
+        position = 0
+        for line in text.split("\n")[:-1]:
+            position += len(line) + 1
+            if recorder is not None:
+                recorder.write(line + "\n")
+            message = line.strip()
+            context_buffer.append(message)
+            errorType = classify_line(message)
+            if errorType is not None:
+                writer.write(text[echo_start:position])
+                writer.flush()
+                echo_start = position
+                monitor.reportError(
+                    message,
+                    context=list(context_buffer),
+                    errorType=errorType,
+                )
+        writer.write(text[echo_start:])
+    writer.flush()
+
+
+async def monitor_process_output_async(
+    cmd: str,
+    env: dict,
+    monitor,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    queue_size: int = LINE_QUEUE_SIZE,
+    recorder=None,
+):
+    """
+    asyncio counterpart of monitor_process_output: launches `cmd`, reads both
+    pipes in large chunks and feeds a bounded queue drained by one classifier
+    task. Returns the process exit code.
+    """
+    process = await asyncio.create_subprocess_shell(
+        cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+    )
+    logging.info(f"Running command: {cmd}")
+    queue = asyncio.Queue(maxsize=queue_size)
+    consumer = asyncio.create_task(
+        classify_queued_lines(queue, monitor, BatchedWriter(), recorder)
+    )
+    try:
+        await asyncio.gather(
+            read_stream_chunks(process.stdout, "stdout", queue, chunk_size),
+            read_stream_chunks(process.stderr, "stderr", queue, chunk_size),
+        )
+        await queue.put(STREAM_DONE)
+        await consumer
+    finally:
+        consumer.cancel()
+        if process.returncode is None:
+            try:
+                process.terminate()
+            except ProcessLookupError:
+                pass
+        await process.wait()
+    return process.returncode
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Launch 'pnpm run dev' and monitor its output for errors."
@@ -437,14 +1629,133 @@ def main():
         default="pnpm run dev",
         help="Command to run (default: 'pnpm run dev')",
     )
+    parser.add_argument(
+        "--mode",
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="Read the process output with one thread per pipe (default) "
+        "or with a single asyncio loop and a bounded classifier queue.",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="Feed a recorded log through the monitor instead of running --cmd.",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=None,
+        help="With --replay, play a --record'ed log at this multiple of its "
+        "original pace (default: as fast as possible).",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Save the command's output with timestamps for later --replay.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["pretty", "ndjson"],
+        default="pretty",
+        help="Report format: indented JSON (default) or compact NDJSON lines.",
+    )
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="Where reports go: '-' for stdout (default), a file path, "
+        "or 'unix:/path/to/socket'.",
+    )
+    parser.add_argument(
+        "--flush-interval",
+        type=float,
+        default=SINK_FLUSH_INTERVAL,
+        help="Seconds between flushes of buffered NDJSON reports.",
+    )
+    parser.add_argument(
+        "--flush-bytes",
+        type=int,
+        default=SINK_FLUSH_BYTES,
+        help="Flush buffered NDJSON reports once this many bytes are pending.",
+    )
+    parser.add_argument(
+        "--max-groups",
+        type=int,
+        default=MAX_ERROR_GROUPS,
+        help="Evict the least recently seen error groups beyond this many.",
+    )
+    parser.add_argument(
+        "--group-ttl",
+        type=float,
+        default=GROUP_TTL,
+        help="Evict error groups idle for this many seconds (0 disables).",
+    )
+    parser.add_argument(
+        "--keep-reports",
+        type=int,
+        default=None,
+        help="Keep only the N most recent reports in memory "
+        "(default: keep all).",
+    )
     args = parser.parse_args()
 
-    monitor = ReportParseErrorMonitor()
+    try:
+        sink = ReportSink(
+            args.output,
+            flush_bytes=args.flush_bytes if args.format == "ndjson" else 0,
+            flush_interval=args.flush_interval,
+        )
+    except OSError as e:
+        logging.error(f"Could not open report output '{args.output}': {e}")
+        sys.exit(1)
+    monitor = ReportParseErrorMonitor(
+        {
+            "format": args.format,
+            "maxReportsKept": args.keep_reports,
+            "maxErrorGroups": args.max_groups,
+            "groupTTL": args.group_ttl or None,
+            "sink": sink,
+        }
+    )
+    monitor.enrichment.prefetch()
+
+    if args.replay:
+        logging.info(f"Replaying log: {args.replay}")
+        try:
+            replay_log(args.replay, monitor, args.speed)
+        except KeyboardInterrupt:
+            logging.info("Interrupted by user, stopping replay...")
+        logging.info("Replay ended. Printing error summary:")
+        monitor.printSummary()
+        monitor.close()
+        return
+
+    recorder = LogRecorder(args.record) if args.record else None
 
     env = os.environ.copy()
     env["DEBUG"] = "*"
     env["NODE_OPTIONS"] = "--trace-deprecation"
 
+    if args.mode == "asyncio":
+        try:
+            asyncio.run(
+                monitor_process_output_async(
+                    args.cmd, env, monitor, recorder=recorder
+                )
+            )
+        except KeyboardInterrupt:
+            logging.info("Interrupted by user, process terminated.")
+        except OSError as e:
+            logging.error(
+                f"Failed to start the process with command '{args.cmd}': {e}"
+            )
+            sys.exit(1)
+        logging.info("Process ended. Printing error summary:")
+        monitor.printSummary()
+        monitor.close()
+        if recorder is not None:
+            recorder.close()
+        return
+
     try:
         process = subprocess.Popen(
             args.cmd,
@@ -463,7 +1774,7 @@ def main():
 
     logging.info(f"Running command: {args.cmd}")
     try:
-        monitor_process_output(process, monitor)
+        monitor_process_output(process, monitor, recorder)
     except KeyboardInterrupt:
         logging.info("Interrupted by user, terminating process...")
         process.terminate()
@@ -472,6 +1783,9 @@ def main():
 
     logging.info("Process ended. Printing error summary:")
     monitor.printSummary()
+    monitor.close()
+    if recorder is not None:
+        recorder.close()
 
 
 if __name__ == "__main__":
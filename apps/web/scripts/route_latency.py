@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+route_latency.py
+
+Streaming latency analytics for the dev server's HTTP log lines
+("GET /app 200 in 37800ms"), used by alert_page_finished_loading.py.
+
+  - Every route keeps log-bucketed histograms (about 2% relative error, similar
+    to an HDR histogram) for all hits, for cold hits (the first hit of a route
+    after the dev server restarted, which includes on-demand compilation) and
+    for warm hits (every later hit).
+  - Rolling one-minute slots give recent percentiles next to the all-time ones.
+  - The analytics are periodically written to a compact JSON snapshot, merged
+    back in on the next start, and can be printed as a table with --report.
+
+Usage:
+    python route_latency.py [--stats-file next-route-latency.json] [--sort p95]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+STATS_FILE = "next-route-latency.json"
+SNAPSHOT_INTERVAL = 30.0
+
+# Histogram bucket growth factor: bucket b >= 1 holds [GROWTH**(b-1), GROWTH**b).
+GROWTH = 1.02
+_LOG_GROWTH = math.log(GROWTH)
+
+# Rolling windows: this many slots of this many seconds each.
+WINDOW_SLOT_SECONDS = 60
+WINDOW_SLOTS = 15
+RECENT_WINDOW = 300
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram. Recording is O(1), memory is bounded by
+    the number of distinct buckets (a few hundred for 1 ms .. 10 min), and two
+    histograms merge by adding bucket counts.
+    """
+
+    __slots__ = ("buckets", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def bucket(value):
+        if value < 1:
+            return 0
+        return 1 + int(math.log(value) / _LOG_GROWTH)
+
+    @staticmethod
+    def bucket_value(bucket):
+        if bucket == 0:
+            return 0.5
+        return GROWTH ** (bucket - 0.5)
+
+    def record(self, value):
+        b = self.bucket(value)
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for b, n in other.buckets.items():
+            self.buckets[b] = self.buckets.get(b, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = (
+                other.min if self.min is None else min(self.min, other.min)
+            )
+            self.max = (
+                other.max if self.max is None else max(self.max, other.max)
+            )
+
+    def percentile(self, q):
+        """
+        Approximate q-th percentile (0-100), or None if empty.
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= rank:
+                return min(max(self.bucket_value(b), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "n": self.count,
+            "sum": round(self.total, 3),
+            "min": self.min,
+            "max": self.max,
+            "b": sorted(self.buckets.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets = {int(b): n for b, n in data.get("b", [])}
+        histogram.count = data.get("n", 0)
+        histogram.total = data.get("sum", 0.0)
+        histogram.min = data.get("min")
+        histogram.max = data.get("max")
+        return histogram
+
+
+class RouteStats:
+    """
+    Latency statistics for one route: all/cold/warm histograms, status code
+    counts and rolling per-minute histograms.
+    """
+
+    def __init__(self):
+        self.all = LatencyHistogram()
+        self.cold = LatencyHistogram()
+        self.warm = LatencyHistogram()
+        self.statuses = {}
+        self.windows = deque(maxlen=WINDOW_SLOTS)
+
+    def record(self, status, duration_ms, cold, now):
+        self.all.record(duration_ms)
+        (self.cold if cold else self.warm).record(duration_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        slot = int(now // WINDOW_SLOT_SECONDS) * WINDOW_SLOT_SECONDS
+        if not self.windows or self.windows[-1][0] != slot:
+            self.windows.append((slot, LatencyHistogram()))
+        self.windows[-1][1].record(duration_ms)
+
+    def recent(self, now, seconds=RECENT_WINDOW):
+        """
+        Histogram of the hits within the last `seconds`.
+        """
+        histogram = LatencyHistogram()
+        horizon = now - seconds
+        for slot, slot_histogram in self.windows:
+            if slot + WINDOW_SLOT_SECONDS > horizon:
+                histogram.merge(slot_histogram)
+        return histogram
+
+    def to_dict(self):
+        return {
+            "all": self.all.to_dict(),
+            "cold": self.cold.to_dict(),
+            "warm": self.warm.to_dict(),
+            "status": self.statuses,
+            "windows": [
+                [slot, histogram.to_dict()] for slot, histogram in self.windows
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.all = LatencyHistogram.from_dict(data.get("all", {}))
+        stats.cold = LatencyHistogram.from_dict(data.get("cold", {}))
+        stats.warm = LatencyHistogram.from_dict(data.get("warm", {}))
+        stats.statuses = dict(data.get("status", {}))
+        for slot, histogram in data.get("windows", []):
+            stats.windows.append((slot, LatencyHistogram.from_dict(histogram)))
+        return stats
+
+
+class LatencyAnalytics:
+    """
+    Per-route latency analytics fed from matched HTTP log lines.
+    Call mark_restart() whenever the dev server restarts so that the next hit
+    of every route is counted as cold. Dev server lifecycle durations
+    (record_metric) are kept and snapshotted alongside the routes. Safe to
+    feed from several threads.
+    """
+
+    def __init__(
+        self, stats_file=STATS_FILE, snapshot_interval=SNAPSHOT_INTERVAL
+    ):
+        self.stats_file = stats_file
+        self.snapshot_interval = snapshot_interval
+        self.routes = {}
+        self.server = {}
+        self.warm_routes = set()
+        self.restarts = 0
+        self.dirty = False
+        self.last_snapshot = time.monotonic()
+        self.lock = threading.Lock()
+        if stats_file and os.path.exists(stats_file):
+            self.load(stats_file)
+
+    @staticmethod
+    def normalize_route(route):
+        return route.split("?", 1)[0] or "/"
+
+    def mark_restart(self):
+        with self.lock:
+            self.warm_routes.clear()
+            self.restarts += 1
+
+    def record(self, route, status, duration_ms, now=None):
+        """
+        Record one request. Returns True if it was a cold hit.
+        """
+        now = time.time() if now is None else now
+        route = self.normalize_route(route)
+        with self.lock:
+            cold = route not in self.warm_routes
+            self.warm_routes.add(route)
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = RouteStats()
+            stats.record(str(status), duration_ms, cold, now)
+            self.dirty = True
+            due = (
+                time.monotonic() - self.last_snapshot >= self.snapshot_interval
+            )
+        if due:
+            self.snapshot()
+        return cold
+
+    def record_metric(self, name, duration_ms):
+        """
+        Record a dev server lifecycle duration (e.g. spawn to ready).
+        """
+        with self.lock:
+            histogram = self.server.get(name)
+            if histogram is None:
+                histogram = self.server[name] = LatencyHistogram()
+            histogram.record(duration_ms)
+            self.dirty = True
+
+    def snapshot(self):
+        """
+        Atomically write the current analytics to the stats file.
+        """
+        with self.lock:
+            if not self.stats_file or not self.dirty:
+                return
+            data = {
+                "version": 1,
+                "updated": time.time(),
+                "routes": {
+                    route: stats.to_dict()
+                    for route, stats in self.routes.items()
+                },
+                "server": {
+                    name: histogram.to_dict()
+                    for name, histogram in self.server.items()
+                },
+            }
+            self.dirty = False
+            self.last_snapshot = time.monotonic()
+        tmp_path = f"{self.stats_file}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.stats_file)
+        except OSError as e:
+            print(
+                f"Could not write latency snapshot {self.stats_file}: {e}",
+                file=sys.stderr,
+            )
+
+    def load(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(
+                f"Ignoring unreadable latency snapshot {path}: {e}",
+                file=sys.stderr,
+            )
+            return
+        for route, stats in data.get("routes", {}).items():
+            self.routes[route] = RouteStats.from_dict(stats)
+        for name, histogram in data.get("server", {}).items():
+            self.server[name] = LatencyHistogram.from_dict(histogram)
+
+    def report(self, sort="p95", now=None):
+        """
+        Return a text table of per-route latency percentiles.
+        """
+        now = time.time() if now is None else now
+
+        def fmt(value):
+            return "-" if value is None else f"{value:.0f}"
+
+        rows = []
+        for route, stats in self.routes.items():
+            recent = stats.recent(now)
+            errors = sum(
+                n for status, n in stats.statuses.items() if status[0] != "2"
+            )
+            rows.append(
+                {
+                    "route": route,
+                    "hits": stats.all.count,
+                    "p50": stats.all.percentile(50),
+                    "p95": stats.all.percentile(95),
+                    "p99": stats.all.percentile(99),
+                    "cold_n": stats.cold.count,
+                    "cold_p50": stats.cold.percentile(50),
+                    "warm_p50": stats.warm.percentile(50),
+                    "recent_p95": recent.percentile(95),
+                    "errors": errors,
+                }
+            )
+        rows.sort(key=lambda row: row.get(sort) or 0, reverse=True)
+
+        lines = [
+            f"{'route':<40} {'hits':>6} {'p50':>8} {'p95':>8} {'p99':>8} "
+            f"{'cold':>5} {'cold p50':>9} {'warm p50':>9} {'5m p95':>8} "
+            f"{'non-2xx':>7}"
+        ]
+        for row in rows:
+            lines.append(
+                f"{row['route'][:40]:<40} {row['hits']:>6} "
+                f"{fmt(row['p50']):>8} {fmt(row['p95']):>8} "
+                f"{fmt(row['p99']):>8} {row['cold_n']:>5} "
+                f"{fmt(row['cold_p50']):>9} {fmt(row['warm_p50']):>9} "
+                f"{fmt(row['recent_p95']):>8} {row['errors']:>7}"
+            )
+        if self.server:
+            lines.append("")
+            lines.append(
+                f"{'dev server':<40} {'count':>6} {'p50':>8} {'p95':>8} "
+                f"{'max':>8}"
+            )
+            for name, histogram in sorted(self.server.items()):
+                lines.append(
+                    f"{name:<40} {histogram.count:>6} "
+                    f"{fmt(histogram.percentile(50)):>8} "
+                    f"{fmt(histogram.percentile(95)):>8} "
+                    f"{fmt(histogram.max):>8}"
+                )
+        lines.append("(latencies in ms)")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print per-route dev server latency from a snapshot."
+    )
+    parser.add_argument("--stats-file", default=STATS_FILE)
+    parser.add_argument(
+        "--sort",
+        choices=["hits", "p50", "p95", "p99", "cold_p50", "warm_p50"],
+        default="p95",
+    )
+    args = parser.parse_args()
+    if not os.path.exists(args.stats_file):
+        print(f"No latency snapshot at {args.stats_file}", file=sys.stderr)
+        sys.exit(1)
+    analytics = LatencyAnalytics(args.stats_file)
+    print(analytics.report(args.sort))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+benchmark-get-dependencies.py
+
+Benchmarks for the section assignment in get-dependencies.py, on synthetic
+dependency graphs (50k "name@version" nodes by default) so they run without
+installing anything.
+
+  walk     Times section_packages (one walk that carries the section down the
+           graph) against the previous approach of one pruned walk per section,
+           on a lockfile-style graph, and checks both assign the same packages.
+  npm-ls   Renders the graph as `npm ls --all --json` output (dependencies
+           listed once per package, other occurrences deduped) and times the
+           legacy recursive traverse, which copies the ancestor path and
+           searches it for section roots at every step, against npm_ls_graph +
+           section_packages. The legacy traverse only sees the printed tree, so
+           it also reports the assignments it misses below deduped entries,
+           and checks the graph rebuilt from the npm ls tree assigns the same
+           packages as the original graph.
+
+Usage:
+    python benchmark-get-dependencies.py walk [--nodes 50000] [--fanout 3]
+    python benchmark-get-dependencies.py npm-ls [--nodes 50000] [--fanout 3]
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+# get-dependencies.py is not importable by name.
+_spec = importlib.util.spec_from_file_location(
+    "get_dependencies",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "get-dependencies.py"),
+)
+get_dependencies = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(get_dependencies)
+
+sections = get_dependencies.sections
+NO_SECTION = get_dependencies.NO_SECTION
+
+
+def synthetic_graph(total_nodes: int, fanout: int, layers: int = 12, seed: int = 1):
+    """
+    A layered dependency graph in the form pnpm_graph returns. Every package
+    name has two versions, the section roots are spread over the top layers,
+    and each node depends on about `fanout` nodes in deeper layers (mostly
+    the next one), so subtrees are heavily shared as in a real lockfile.
+    """
+    rng = random.Random(seed)
+    roots = [pkg for _, pkgs in sections for pkg in pkgs]
+    per_layer = max(1, total_nodes // layers)
+    names = [f"pkg-{index // 2}" for index in range(total_nodes)]
+    for offset, root in enumerate(roots):
+        names[(offset * 7) % per_layer] = root
+    keys = [f"{name}@1.0.{index % 2}" for index, name in enumerate(names)]
+
+    nodes = {"": []}
+    for index, key in enumerate(keys):
+        nodes.setdefault(key, [])
+        layer = index // per_layer
+        if layer >= layers - 1:
+            continue
+        deps = {}
+        for _ in range(rng.randint(0, fanout * 2)):
+            target_layer = min(layers - 1, layer + 1 + int(rng.expovariate(1.5)))
+            low = target_layer * per_layer
+            high = min(total_nodes, low + per_layer) - 1
+            if low > high:
+                continue
+            target = rng.randint(low, high)
+            deps[names[target]] = keys[target]
+        nodes[key].extend(sorted(deps.items()))
+    top = {}
+    for index in rng.sample(range(per_layer), min(per_layer, 200)):
+        top[names[index]] = keys[index]
+    for root in roots:
+        index = names.index(root)
+        top[root] = keys[index]
+    nodes[""] = sorted(top.items())
+    return {"root": "", "nodes": nodes}
+
+
+def synthetic_npm_ls(graph):
+    """
+    The graph as `npm ls --all --json` prints it: the dependencies of a node
+    under its first occurrence only, later occurrences marked deduped.
+    """
+    nodes = graph["nodes"]
+    expanded = set()
+
+    def render(key):
+        version = key.rsplit("@", 1)[1]
+        if key in expanded or not nodes.get(key):
+            entry = {"version": version}
+            if key in expanded:
+                entry["deduped"] = True
+            return entry
+        expanded.add(key)
+        return {
+            "version": version,
+            "dependencies": {name: render(child) for name, child in nodes[key]},
+        }
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 10_000))
+    try:
+        return {
+            "name": "synthetic",
+            "dependencies": {
+                name: render(child) for name, child in nodes[graph["root"]]
+            },
+        }
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def legacy_section_packages(graph, blocked, roots):
+    """
+    The per-section walk used before section_packages: the packages reached
+    through a path containing one of `roots` and none of `blocked`.
+    """
+    found = set()
+    nodes = graph["nodes"]
+    visited = set()
+    pending = [(graph["root"], not roots)]
+    while pending:
+        key, inside = pending.pop()
+        if (key, inside) in visited:
+            continue
+        visited.add((key, inside))
+        for name, child in nodes.get(key, ()):
+            if name in blocked:
+                continue
+            child_inside = inside or name in roots
+            if child_inside:
+                found.add(name)
+            pending.append((child, child_inside))
+    return found
+
+
+def legacy_walks(graph):
+    found = []
+    blocked = set()
+    for _, pkgs in sections:
+        found.append(legacy_section_packages(graph, blocked, set(pkgs)))
+        blocked.update(pkgs)
+    found.append(legacy_section_packages(graph, blocked, set()))
+    return found
+
+
+def legacy_assign_section(ancestors):
+    for index, (_, pkg_list) in enumerate(sections):
+        for pkg in pkg_list:
+            if pkg in ancestors:
+                return index
+    return NO_SECTION
+
+
+def legacy_traverse(node, ancestors, found):
+    """The recursive npm ls traversal used before npm_ls_graph."""
+    if isinstance(node, dict) and "dependencies" in node:
+        for dep_name, dep_node in node["dependencies"].items():
+            current_path = ancestors + [dep_name]
+            found[legacy_assign_section(current_path)].add(dep_name)
+            legacy_traverse(dep_node, current_path, found)
+
+
+def _time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - began)
+    return result, best
+
+
+def _describe(graph):
+    edges = sum(len(deps) for deps in graph["nodes"].values())
+    return f"{len(graph['nodes']):,} nodes, {edges:,} edges"
+
+
+def _compare(expected, actual, label):
+    mismatches = [
+        index for index, (a, b) in enumerate(zip(expected, actual)) if a != b
+    ]
+    for index in mismatches:
+        header = sections[index][0] if index < NO_SECTION else "(extra)"
+        print(
+            f"MISMATCH {label} in {header}: "
+            f"{len(expected[index] ^ actual[index])} packages differ"
+        )
+    return not mismatches
+
+
+def bench_walk(args):
+    graph = synthetic_graph(args.nodes, args.fanout)
+    print(f"graph: {_describe(graph)}")
+    legacy, legacy_time = _time(lambda: legacy_walks(graph), args.repeat)
+    found, walk_time = _time(
+        lambda: get_dependencies.section_packages(graph), args.repeat
+    )
+    print(f"{'per-section walks':>20}: {legacy_time * 1000:>10.1f} ms")
+    print(f"{'section_packages':>20}: {walk_time * 1000:>10.1f} ms")
+    print(f"{sum(map(len, found)):,} section assignments")
+    if not _compare(legacy, found, "per-section walks vs section_packages"):
+        sys.exit(1)
+
+
+def bench_npm_ls(args):
+    graph = synthetic_graph(args.nodes, args.fanout)
+    tree = synthetic_npm_ls(graph)
+    print(f"graph: {_describe(graph)}")
+
+    def legacy():
+        found = [set() for _ in range(NO_SECTION + 1)]
+        legacy_traverse(tree, [], found)
+        return found
+
+    def walk():
+        return get_dependencies.section_packages(
+            get_dependencies.npm_ls_graph(tree)
+        )
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 10_000))
+    try:
+        legacy_found, legacy_time = _time(legacy, args.repeat)
+    finally:
+        sys.setrecursionlimit(limit)
+    found, walk_time = _time(walk, args.repeat)
+    print(f"{'legacy traverse':>20}: {legacy_time * 1000:>10.1f} ms")
+    print(f"{'npm_ls_graph + walk':>20}: {walk_time * 1000:>10.1f} ms")
+    # The legacy traversal never looks below deduped occurrences, so it can
+    # miss packages a section reaches through them.
+    missed = sum(len(b - a) for a, b in zip(legacy_found, found))
+    print(f"{missed:,} assignments reached only through deduped occurrences")
+    expected = get_dependencies.section_packages(graph)
+    if not _compare(expected, found, "npm ls graph vs original graph"):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for get-dependencies.py."
+    )
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    for name, func, help_text in (
+        ("walk", bench_walk, "section_packages vs. one walk per section."),
+        ("npm-ls", bench_npm_ls, "npm ls tree: legacy traverse vs. graph walk."),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--nodes", type=int, default=50_000)
+        sub.add_argument(
+            "--fanout", type=int, default=3, help="Mean dependencies per node."
+        )
+        sub.add_argument(
+            "--repeat", type=int, default=3, help="Best-of-N timing runs."
+        )
+        sub.set_defaults(func=func)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(130)
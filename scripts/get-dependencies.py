@@ -1,3 +1,7 @@
+import argparse
+import hashlib
+import os
+import re
 import subprocess
 import json
 import sys
@@ -85,36 +89,26 @@ original_set = set(original_packages)
 assigned = {header: set(pkgs) for header, pkgs in sections}
 extra = set()  # for packages not falling under any section
 
+# Root package name -> index of the first section that lists it. A package
+# belongs to the first section with a root among its ancestors, so the
+# section of a path is the smallest index seen along it.
+root_sections = {}
+for index, (header, pkgs) in enumerate(sections):
+    for pkg in pkgs:
+        root_sections.setdefault(pkg, index)
+# The section index of packages under no section root.
+NO_SECTION = len(sections)
 
-def assign_section(ancestors):
-    """
-    Given a list of ancestor package names, return the first section header
-    (in the order of `sections`) for which any package in that section is an ancestor.
-    If none match, return None.
-    """
-    for header, pkg_list in sections:
-        for pkg in pkg_list:
-            if pkg in ancestors:
-                return header
-    return None
+# Lockfiles the dependency graph can be read from, in order of preference.
+LOCKFILE_NAMES = ["pnpm-lock.yaml", "package-lock.json"]
+# The parsed graph and section results, next to the lockfile.
+CACHE_NAME = os.path.join("node_modules", ".cache", "get-dependencies.json")
+# Bump when the cached graph or section format changes.
+CACHE_VERSION = 2
 
-
-def traverse(node, ancestors):
-    """
-    Recursively traverse the dependency tree.
-    `ancestors` is a list of package names from the root (excluding the project root).
-    """
-    if isinstance(node, dict) and "dependencies" in node:
-        for dep_name, dep_node in node["dependencies"].items():
-            current_path = ancestors + [dep_name]
-            # Assign this package based on ancestors.
-            section = assign_section(current_path)
-            if section:
-                assigned[section].add(dep_name)
-            else:
-                extra.add(dep_name)
-            # Recurse
-            traverse(dep_node, current_path)
+# "name@version" in an aliased pnpm dependency ("string-width-cjs:
+# string-width@4.2.3"); plain versions never have a name in front.
+PNPM_ALIAS = re.compile(r"^((?:@[^/@]+/)?[^@(/][^@(]*)@(.+)$")
 
 
 def fetch_dependency_tree():
@@ -140,15 +134,368 @@ def fetch_dependency_tree():
     return tree
 
 
-def main():
+def find_lockfile(start):
+    """
+    The nearest lockfile in `start` or one of its parents, or None.
+    """
+    directory = os.path.abspath(start)
+    while True:
+        for name in LOCKFILE_NAMES:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _unquote(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]
+    return text
+
+
+def parse_pnpm_lockfile(path):
+    """
+    Read the parts of a pnpm-lock.yaml (lockfile v6 or v9) that describe the
+    dependency graph, without a YAML parser: the lockfile is machine-written,
+    two-space indented and one key per line.
+    Returns (importers, packages): importer path -> {dep name: version} and
+    package key ("name@version(peers)") -> {dep name: version}.
+    """
+    importers = {}
+    packages = {}
+    top = None
+    entry = None
+    group = None
+    dep = None
+    with open(path, "r", encoding="utf-8") as f:
+        for raw_line in f:
+            line = raw_line.rstrip("\n")
+            stripped = line.lstrip(" ")
+            if not stripped or stripped.startswith("#"):
+                continue
+            indent = len(line) - len(stripped)
+            key, _, value = stripped.partition(":")
+            # Keys may be quoted and contain ": " only inside the quotes.
+            if stripped[0] in "'\"":
+                end = stripped.index(stripped[0], 1)
+                key = stripped[1:end]
+                value = stripped[end + 1 :].lstrip(":")
+            value = value.strip()
+            if indent == 0:
+                top = key
+                continue
+            if top == "importers":
+                if indent == 2:
+                    entry = importers.setdefault(key, {})
+                elif indent == 4:
+                    group = key in (
+                        "dependencies",
+                        "devDependencies",
+                        "optionalDependencies",
+                    )
+                elif indent == 6 and group:
+                    dep = key
+                    if value:  # lockfile v5: "name: version"
+                        entry[dep] = _unquote(value)
+                elif indent == 8 and group and key == "version":
+                    entry[dep] = _unquote(value)
+            elif top in ("snapshots", "packages"):
+                if indent == 2:
+                    entry = packages.setdefault(key.lstrip("/"), {})
+                elif indent == 4:
+                    group = key in ("dependencies", "optionalDependencies")
+                elif indent == 6 and group:
+                    entry[key] = _unquote(value)
+    return importers, packages
+
+
+def pnpm_graph(path, importer):
+    """
+    The dependency graph of `importer` (a path relative to the lockfile's
+    directory) from a pnpm lockfile. Nodes are keyed by "name@version(peers)",
+    and workspace packages by "link:<importer path>".
+    """
+    importers, packages = parse_pnpm_lockfile(path)
+    if importer not in importers:
+        raise KeyError(f"{importer!r} is not an importer in {path}")
+
+    def node_id(name, version, base):
+        if version.startswith("link:"):
+            target = os.path.normpath(os.path.join(base, version[5:]))
+            return "link:" + target.replace(os.sep, "/")
+        alias = PNPM_ALIAS.match(version)
+        if alias:
+            return version
+        return f"{name}@{version}"
+
+    nodes = {}
+    pending = [("link:" + importer, importer)]
+    while pending:
+        key, base = pending.pop()
+        if key in nodes:
+            continue
+        if key.startswith("link:"):
+            deps = importers.get(key[5:], {})
+        else:
+            deps = packages.get(key, {})
+        edges = []
+        for name, version in deps.items():
+            child = node_id(name, version, base)
+            edges.append([name, child])
+            if child not in nodes:
+                child_base = child[5:] if child.startswith("link:") else base
+                pending.append((child, child_base))
+        nodes[key] = edges
+    return {"root": "link:" + importer, "nodes": nodes}
+
+
+def npm_graph(path, importer):
+    """
+    The dependency graph of `importer` from a package-lock.json (lockfile
+    v2 or v3), resolving every dependency the way Node does: the nearest
+    node_modules going up from the dependent. Nodes are keyed by install
+    path.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        packages = json.load(f).get("packages")
+    if packages is None:
+        raise KeyError(f"{path} has no 'packages' (lockfile v1)")
+    root = "" if importer == "." else importer
+    if root not in packages:
+        raise KeyError(f"{importer!r} is not a package in {path}")
+
+    def resolve(base, name):
+        while True:
+            prefix = f"{base}/node_modules/" if base else "node_modules/"
+            candidate = prefix + name
+            if candidate in packages:
+                entry = packages[candidate]
+                return entry["resolved"] if entry.get("link") else candidate
+            if not base:
+                return None
+            cut = base.rfind("/node_modules/")
+            base = base[:cut] if cut != -1 else ""
+
+    nodes = {}
+    pending = [root]
+    while pending:
+        key = pending.pop()
+        if key in nodes:
+            continue
+        entry = packages.get(key, {})
+        names = dict(entry.get("dependencies", {}))
+        names.update(entry.get("optionalDependencies", {}))
+        names.update(entry.get("peerDependencies", {}))
+        if key == root:
+            names.update(entry.get("devDependencies", {}))
+        edges = []
+        for name in names:
+            child = resolve(key, name)
+            if child is None:
+                continue  # an optional or peer dependency that isn't installed
+            edges.append([name, child])
+            if child not in nodes:
+                pending.append(child)
+        nodes[key] = edges
+    return {"root": root, "nodes": nodes}
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get("version") == CACHE_VERSION else {}
+
+
+def save_cache(path, cache):
+    cache["version"] = CACHE_VERSION
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def resolve_dependency_graph(lockfile, importer, cache):
+    """
+    The graph for `importer`, parsed from `lockfile` or taken from `cache`
+    when the lockfile has not changed since it was parsed.
+    Returns (graph, graph_key); graph_key identifies the lockfile contents.
+    """
+    graph_key = hashlib.sha256(
+        f"{file_hash(lockfile)}\0{importer}".encode("utf-8")
+    ).hexdigest()
+    if cache.get("graph_key") == graph_key:
+        return cache["graph"], graph_key
+    if lockfile.endswith(".yaml"):
+        graph = pnpm_graph(lockfile, importer)
+    else:
+        graph = npm_graph(lockfile, importer)
+    cache["graph_key"] = graph_key
+    cache["graph"] = graph
+    return graph, graph_key
+
+
+def npm_ls_graph(tree):
+    """
+    The `npm ls --all --json` tree as a graph of deduplicated "name@version"
+    nodes, in the form `pnpm_graph` returns. npm prints the dependencies of a
+    package under one of its occurrences and marks the others "deduped", so
+    the children listed under every occurrence of a node are merged.
+    """
+    edges = {"": {}}
+    pending = [("", tree)]
+    while pending:
+        key, node = pending.pop()
+        for name, child in node.get("dependencies", {}).items():
+            child_key = f"{name}@{child.get('version', '')}"
+            edges[key][name] = child_key
+            edges.setdefault(child_key, {})
+            if child.get("dependencies"):
+                pending.append((child_key, child))
+    nodes = {key: sorted(deps.items()) for key, deps in edges.items()}
+    return {"root": "", "nodes": nodes}
+
+
+def section_packages(graph):
+    """
+    The names of the packages in each section, indexed like `sections` with
+    the packages under no section root last. A package is reached with the
+    section of the earliest section root on the path to it; that section is
+    carried down the walk instead of searching the ancestors at every step,
+    and each node is expanded at most once per section it is reached with,
+    so the walk is linear in the size of the graph.
+    """
+    found = [set() for _ in range(NO_SECTION + 1)]
+    # Per section, the nodes already expanded with that section.
+    expanded = [set() for _ in range(NO_SECTION + 1)]
+    nodes = graph["nodes"]
+    expanded[NO_SECTION].add(graph["root"])
+    pending = [(graph["root"], NO_SECTION)]
+    while pending:
+        key, section = pending.pop()
+        names, seen = found[section], expanded[section]
+        for name, child in nodes.get(key, ()):
+            if name in root_sections and root_sections[name] < section:
+                child_section = root_sections[name]
+                if child not in expanded[child_section]:
+                    expanded[child_section].add(child)
+                    pending.append((child, child_section))
+                found[child_section].add(name)
+                continue
+            names.add(name)
+            if child not in seen:
+                seen.add(child)
+                pending.append((child, section))
+    return found
+
+
+def assign_sections(found):
+    for (header, _), names in zip(sections, found):
+        assigned[header].update(names)
+    extra.update(found[NO_SECTION])
+
+
+def assign_from_graph(graph, graph_key, cache):
+    """
+    Fill `assigned` and `extra` from the graph. The sections are cached under
+    the graph and the roots of every section (in order), and recomputed in
+    one walk when either changed. Returns whether they were recomputed.
+    """
+    parts = [graph_key, [sorted(pkgs) for _, pkgs in sections]]
+    key = hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+    recomputed = cache.get("sections_key") != key
+    if recomputed:
+        found = [sorted(names) for names in section_packages(graph)]
+        cache["sections_key"] = key
+        cache["sections"] = found
+    else:
+        found = cache["sections"]
+    assign_sections(found)
+    return recomputed
+
+
+def assign_from_npm_ls():
     tree = fetch_dependency_tree()
     # Start traversal from the top-level dependencies.
     if "dependencies" in tree:
-        traverse(tree, [])
+        assign_sections(section_packages(npm_ls_graph(tree)))
     else:
         print("No dependencies found in npm ls output.", file=sys.stderr)
         sys.exit(1)
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Regenerate the transpilePackages list from the lockfile "
+        "(or, as a fallback, from npm ls)."
+    )
+    parser.add_argument(
+        "--importer",
+        help="The workspace package to list, as a path relative to the "
+        "lockfile (default: the current directory).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse the lockfile again, recompute every section, and leave "
+        "the cache file untouched.",
+    )
+    parser.add_argument(
+        "--npm-ls",
+        action="store_true",
+        help="Use npm ls --all --json instead of reading the lockfile.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    lockfile = None if args.npm_ls else find_lockfile(os.getcwd())
+    if lockfile is not None:
+        lockfile_dir = os.path.dirname(lockfile)
+        importer = args.importer or os.path.relpath(os.getcwd(), lockfile_dir)
+        importer = importer.replace(os.sep, "/")
+        cache_path = os.path.join(lockfile_dir, CACHE_NAME)
+        cache = {} if args.no_cache else load_cache(cache_path)
+        try:
+            graph, graph_key = resolve_dependency_graph(
+                lockfile, importer, cache
+            )
+        except (KeyError, ValueError, OSError) as e:
+            print(
+                f"Warning: could not read {lockfile} ({e}). "
+                "Falling back to npm ls...",
+                file=sys.stderr,
+            )
+            lockfile = None
+        else:
+            recomputed = assign_from_graph(graph, graph_key, cache)
+            if not args.no_cache:
+                save_cache(cache_path, cache)
+            print(
+                f"Read {os.path.basename(lockfile)} "
+                f"({len(graph['nodes'])} packages, sections "
+                f"{'recomputed' if recomputed else 'cached'}).",
+                file=sys.stderr,
+            )
+    if lockfile is None:
+        assign_from_npm_ls()
+
     # Remove any packages that were already in the original_set from extra
     extra_packages = sorted(extra - original_set)
 